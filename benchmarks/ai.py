@@ -0,0 +1,33 @@
+""" Measures how many nodes the computer player's search gets through a
+    second, in one process and spread over every core
+
+    Run from the repositories root directory with
+
+        python benchmarks/ai.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+#pylint: disable=wrong-import-position
+from python_tactics.ai import ComputerPlayer, search
+from python_tactics.game_state import GameState
+
+BUDGET = 2.0
+
+def main():
+    state = GameState.new_match(10, 10, rng=random.Random(0))
+    _, iterations = search(state, BUDGET, random.Random(0))
+    print(f"search, 1 process     {iterations / BUDGET:>10.0f} nodes/s")
+    for processes in sorted({2, os.cpu_count()}):
+        computer = ComputerPlayer(0, BUDGET, processes=processes)
+        # The first search includes starting the processes
+        computer.choose(state)
+        computer.choose(state)
+        print(f"ComputerPlayer, {processes:>2} processes {computer.nodes_per_second:>10.0f} nodes/s")
+        computer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+""" Times a Motion tick as the characters in a scene go from a handful to
+    thousands, with four of them walking and with all of them walking
+
+    Run from the repositories root directory with
+
+        python benchmarks/motion.py
+"""
+import os
+import random
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+#pylint: disable=wrong-import-position
+from python_tactics.motion import Motion
+
+TICKS = 200
+FRAME = 1 / 60
+
+def scene(characters, walking):
+    " A Motion with characters standing about, walking of them along long paths "
+    rng = random.Random(0)
+    motion = Motion()
+    slots = [motion.add(count, rng.uniform(0, 5000), rng.uniform(0, 2500))
+             for count in range(characters)]
+    for slot in slots[:walking]:
+        for _ in range(TICKS):
+            motion.move_to(slot, rng.uniform(0, 5000), rng.uniform(0, 2500), 0.3)
+    return motion
+
+def per_tick(motion):
+    " Mean microseconds a tick of motion takes "
+    started = timer()
+    for _ in range(TICKS):
+        motion.tick(FRAME)
+    return (timer() - started) / TICKS * 1e6
+
+def main():
+    print(f"{'characters':>10} {'4 walking us':>13} {'all walking us':>15}")
+    for characters in (4, 100, 1000, 10000):
+        few = per_tick(scene(characters, 4))
+        every = per_tick(scene(characters, characters))
+        print(f"{characters:>10} {few:>13.1f} {every:>15.0f}")
+
+if __name__ == "__main__":
+    main()
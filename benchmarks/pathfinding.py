@@ -0,0 +1,50 @@
+""" Times PathFinder queries on small, medium and very large maps
+
+    Run from the repositories root directory with
+
+        python benchmarks/pathfinding.py
+"""
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+#pylint: disable=wrong-import-position
+from python_tactics.pathfinding import IMPASSABLE, PathFinder
+
+
+def with_wall(size):
+    " A map with a wall down the middle, with a single gap at the bottom "
+    costs = [1] * (size * size)
+    middle = size // 2
+    for row in range(size - 1):
+        costs[middle * size + row] = IMPASSABLE
+    return costs
+
+def time_query(finder, start, end, blocked=(), repeat=3):
+    best, path = None, None
+    for _ in range(repeat):
+        started = timer()
+        path = finder.find_path(start, end, blocked)
+        elapsed = timer() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, path
+
+def main():
+    print(f"{'map':>11} {'query':<14} {'steps':>6} {'best ms':>10}")
+    for size in (10, 100, 1000):
+        corner = size - 1
+        units = {(corner // 2, row) for row in range(1, size - 1, 3)}
+        queries = [
+            ("open", PathFinder(size, size), (0, 0), (corner, corner), ()),
+            ("occupied", PathFinder(size, size), (0, 0), (corner, corner), units),
+            ("wall", PathFinder(size, size, with_wall(size)), (0, 0), (corner, 0), ()),
+        ]
+        for name, finder, start, end, blocked in queries:
+            elapsed, path = time_query(finder, start, end, blocked)
+            steps = len(path) if path is not None else "-"
+            print(f"{size:>5}x{size:<5} {name:<14} {steps:>6} {elapsed * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+""" Compares branching a GameState, which shares everything, with deep
+    copying it, on the normal match and on a thousand units on a
+    500 x 500 map
+
+    Run from the repositories root directory with
+
+        python benchmarks/persistent.py
+"""
+import os
+import random
+import sys
+from copy import deepcopy
+from functools import partial
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+#pylint: disable=wrong-import-position
+from python_tactics.game_state import GameState
+
+REPEATS = 200
+
+def big_match(size=500, units=1000):
+    rng = random.Random(0)
+    state = GameState(size, size, rng=rng)
+    for count, cell in enumerate(rng.sample(range(size * size), units)):
+        state.add_unit(count % 2, count % 2, cell // size, cell % size)
+    return state
+
+def per_call(function, repeats=REPEATS):
+    " Mean microseconds a call to function takes "
+    started = timer()
+    for _ in range(repeats):
+        function()
+    return (timer() - started) / repeats * 1e6
+
+def branch_and_move(state, unit, cell):
+    " Branch state and move unit to cell in the branch "
+    branch = state.branch()
+    branch.move(unit, cell)
+
+def main():
+    matches = (("10x10, 4 units", GameState.new_match(10, 10, rng=random.Random(0))),
+               ("500x500, 1000 units", big_match()))
+    print(f"{'match':<20} {'branch us':>10} {'deepcopy us':>12} {'branch and move us':>19}")
+    for name, state in matches:
+        unit = state.team(state.current_team)[0]
+        cell = min(state.reachable(unit))
+        branch = per_call(state.branch)
+        copied = per_call(partial(deepcopy, state), 10)
+        moved = per_call(partial(branch_and_move, state, unit, cell))
+        print(f"{name:<20} {branch:>10.1f} {copied:>12.0f} {moved:>19.1f}")
+
+if __name__ == "__main__":
+    main()
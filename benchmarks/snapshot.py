@@ -0,0 +1,54 @@
+""" Measures how long saving and loading a snapshot takes, for a match
+    with a thousand units on a 500 x 500 map
+
+    Run from the repositories root directory with
+
+        python benchmarks/snapshot.py
+"""
+import os
+import random
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+#pylint: disable=wrong-import-position
+from python_tactics import snapshot
+from python_tactics.game_state import Direction, GameState
+from python_tactics.map import Map
+
+SIZE = 500
+UNITS = 1000
+REPEATS = 20
+
+def big_match():
+    rng = random.Random(0)
+    game_map = Map(SIZE, SIZE)
+    for index in range(SIZE * SIZE):
+        game_map.heights[index] = rng.randrange(4)
+    state = GameState(SIZE, SIZE, game_map.costs, rng=rng)
+    cells = rng.sample(range(SIZE * SIZE), UNITS)
+    for count, cell in enumerate(cells):
+        state.add_unit(count % 2, count % 2, cell // SIZE, cell % SIZE,
+                       rng.choice(list(Direction)), rng.randint(1, 10))
+    return game_map, state
+
+def best_of(function):
+    " Fastest of REPEATS calls to function, in milliseconds "
+    times = []
+    for _ in range(REPEATS):
+        started = timer()
+        function()
+        times.append(timer() - started)
+    return min(times) * 1000
+
+def main():
+    game_map, state = big_match()
+    data = snapshot.save(state, game_map)
+    print(f"snapshot        {len(data) / 1024:>8.0f} KiB")
+    print(f"save            {best_of(lambda: snapshot.save(state, game_map)):>8.1f} ms")
+    print(f"load, no map    {best_of(lambda: snapshot.load(data)):>8.1f} ms")
+    print(f"load with map   {best_of(lambda: snapshot.load(data, Map)):>8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+""" Times how long the game takes to get to the main menu, and how long
+    the game scene's assets then take to load
+
+    Run from the repositories root directory with
+
+        python benchmarks/startup.py
+
+    Every stage after the first depends on what has already been imported
+    and loaded, so each run should be in a fresh interpreter.
+"""
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+def stage(name, started):
+    now = timer()
+    print(f"{name:<32} {(now - started) * 1000:>9.1f} ms")
+    return now
+
+def main():
+    started = first = timer()
+
+    #pylint: disable=import-outside-toplevel
+    import pyglet
+    started = stage("import pyglet", started)
+
+    from python_tactics.camera import PEPPY, Camera
+    from python_tactics.scenes import MainMenuScene, World
+    from python_tactics.assets import assets
+    started = stage("import python_tactics.scenes", started)
+
+    window = pyglet.window.Window(800, 600, visible=False)
+    camera = Camera((-600, -300, 1400, 600), (400, 400), 300, speed=PEPPY)
+    world = World(window, camera)
+    started = stage("create window", started)
+
+    world.transition(MainMenuScene)
+    window.dispatch_event("on_draw")
+    window.flip()
+    started = stage("main menu first frame", started)
+    stage("time to main menu", first)
+
+    assets.preload("game")
+    stage("preload game assets", started)
+    window.close()
+
+if __name__ == "__main__":
+    main()
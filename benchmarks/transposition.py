@@ -0,0 +1,54 @@
+""" Measures what the transposition table saves: greedy matches played
+    with and without one, and how often the search finds positions it
+    has seen before
+
+    Run from the repositories root directory with
+
+        python benchmarks/transposition.py
+"""
+import os
+import random
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+#pylint: disable=wrong-import-position
+from python_tactics.ai import greedy_action, search
+from python_tactics.game_state import GameState
+from python_tactics.zobrist import TranspositionTable
+
+MATCHES = 200
+BUDGET = 2.0
+
+def play(table):
+    " Seconds to play MATCHES greedy matches, every one sharing table "
+    started = timer()
+    for seed in range(MATCHES):
+        rng = random.Random(seed)
+        state = GameState.new_match(10, 10, rng=rng, table=table)
+        while state.winner is None and state.turn < 1000:
+            state.apply(greedy_action(state, rng))
+    return timer() - started
+
+def report(name, table):
+    print(f"{name:<22} {table.hits:>9} hits {table.misses:>9} misses "
+          f"{table.hit_rate:>7.1%} hit rate {len(table):>7} stored")
+
+def main():
+    without = play(None)
+    table = TranspositionTable()
+    with_table = play(table)
+    print(f"greedy, no table       {MATCHES / without:>10.0f} matches/s")
+    print(f"greedy, table          {MATCHES / with_table:>10.0f} matches/s  "
+          f"{without / with_table:.2f}x")
+    report("greedy table", table)
+
+    table = TranspositionTable()
+    state = GameState.new_match(10, 10, rng=random.Random(0))
+    _, iterations = search(state, BUDGET, random.Random(0), table=table)
+    print(f"search                 {iterations / BUDGET:>10.0f} nodes/s")
+    report("search table", table)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+    Computer players, which choose actions for a GameState
+"""
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, wait
+from math import log, sqrt
+from multiprocessing import get_context
+from timeit import default_timer as timer
+
+from python_tactics.game_state import ATTACK, MOVE, PASS, Action
+from python_tactics.zobrist import TranspositionTable, mix
+
+# Told apart from other things remembered by a state's hash in its table
+_GREEDY, _CANDIDATES = mix(1), mix(2)
+
+def greedy_action(state, rng=random):
+    """ Attack the weakest enemy in range of anyone, hitting hardest first,
+        otherwise move whoever can get closest to attacking an enemy.
+        Ties are broken with rng. The ties are remembered in the state's
+        table, if it has one
+    """
+    if state.table is None:
+        choices = _greedy_choices(state)
+    else:
+        key = state.hash ^ _GREEDY
+        choices = state.table.get(key)
+        if choices is None:
+            choices = _greedy_choices(state)
+            state.table.put(key, choices)
+    return choices[0] if len(choices) == 1 else rng.choice(choices)
+
+def _gap(unit, cell, enemies):
+    " Steps unit would still need from cell to have an enemy in range "
+    column, row = cell
+    return max(0, min(abs(column - enemy.i) + abs(row - enemy.j) for enemy in enemies)
+               - unit.stats.range)
+
+def _greedy_choices(state):
+    " The equally good actions greedy_action chooses between "
+    team = state.team(state.current_team)
+    enemies = [unit for unit in state.units if unit.team != state.current_team]
+    attacks = [((target.health, -unit.stats.strength), Action(ATTACK, unit.position, target.position))
+               for unit in team for target in state.targets(unit)]
+    if attacks:
+        weakest = min(attacks)[0]
+        return [action for order, action in attacks if order == weakest]
+
+    best, best_gap = [], None
+    for unit in team:
+        for cell in sorted(state.reachable(unit)):
+            gap = _gap(unit, cell, enemies)
+            if best_gap is None or gap < best_gap:
+                best, best_gap = [Action(MOVE, unit.position, cell)], gap
+            elif gap == best_gap:
+                best.append(Action(MOVE, unit.position, cell))
+    return best or [PASS]
+
+def candidate_actions(state, moves_per_unit=3):
+    """ The actions worth searching: every attack, and for each unit the
+        moves which leave it closest to attacking, with the current
+        distance breaking ties so units don't crowd. Passing only when
+        nothing else is possible. Remembered in the state's table, if it
+        has one, so don't change the list returned
+    """
+    if state.table is not None:
+        key = state.hash ^ _CANDIDATES
+        actions = state.table.get(key)
+        if actions is None:
+            actions = _candidate_actions(state, moves_per_unit)
+            state.table.put(key, actions)
+        return actions
+    return _candidate_actions(state, moves_per_unit)
+
+def _candidate_actions(state, moves_per_unit):
+    actions = []
+    enemies = [unit for unit in state.units if unit.team != state.current_team]
+    for unit in state.team(state.current_team):
+        actions.extend(Action(ATTACK, unit.position, target.position)
+                       for target in state.targets(unit))
+        moves = sorted(state.reachable(unit), key=lambda cell, unit=unit: (_gap(unit, cell, enemies), cell))
+        actions.extend(Action(MOVE, unit.position, cell) for cell in moves[:moves_per_unit])
+    return actions or [PASS]
+
+class _Node:
+    " Statistics of one sequence of actions from the root "
+
+    __slots__ = ("visits", "wins", "children", "untried")
+
+    def __init__(self):
+        self.visits = 0
+        # Wins for the team which took the action leading here
+        self.wins = 0.0
+        self.children = {}
+        self.untried = None
+
+def _score(state, team):
+    " 1 if team has won, 0 if it has lost, otherwise its share of the health left "
+    winner = state.winner
+    if winner is not None:
+        return 1.0 if winner == team else 0.0
+    ours = theirs = 0
+    for unit in state.units:
+        if unit.team == team:
+            ours += unit.health
+        else:
+            theirs += unit.health
+    return ours / (ours + theirs)
+
+def search(state, budget, rng=random, exploration=1.4, rollout_turns=20, table=None):
+    """ Monte Carlo tree search from state for budget seconds.
+
+        The tree is open loop: nodes stand for sequences of actions rather
+        than states, and every iteration replays its sequence on a fresh
+        copy of state, so the random damage of attacks is sampled instead
+        of branched on. Rollouts play greedy actions for rollout_turns
+        turns and are scored by the health each side has left.
+
+        Every copy shares table, or else the state's table or a new one,
+        so positions reached again, by any iteration, cost lookups
+        instead of searches for reachable cells and actions worth trying.
+
+        Returns {action: (visits, wins)} for the root's actions, and the
+        number of iterations run
+    """
+    if table is None:
+        table = state.table if state.table is not None else TranspositionTable()
+    table.new_generation()
+    state = state.copy(rng, table)
+    team = state.current_team
+    root = _Node()
+    iterations = 0
+    deadline = timer() + budget
+    while timer() < deadline or not iterations:
+        iterations += 1
+        current = state.copy(rng)
+        node, path = root, [(root, None)]
+        while current.winner is None:
+            if node.untried is None:
+                node.untried = list(candidate_actions(current))
+                rng.shuffle(node.untried)
+            if node.untried:
+                action = node.untried.pop()
+                mover = current.current_team
+                if current.apply(action) is None:
+                    continue
+                child = node.children[action] = _Node()
+                path.append((child, mover))
+                break
+            mover = current.current_team
+            action, child = _select(node, exploration)
+            if child is None or current.apply(action) is None:
+                # The dice went differently this time, and this line of play can't happen
+                break
+            node = child
+            path.append((node, mover))
+        for _ in range(rollout_turns):
+            if current.winner is not None:
+                break
+            current.apply(greedy_action(current, rng))
+        score = _score(current, team)
+        for visited, mover in path:
+            visited.visits += 1
+            if mover is not None:
+                visited.wins += score if mover == team else 1.0 - score
+    return {action: (child.visits, child.wins) for action, child in root.children.items()}, iterations
+
+def _select(node, exploration):
+    " The child with the best upper confidence bound "
+    log_visits = log(node.visits or 1)
+    best, best_bound = (None, None), -1.0
+    for action, child in node.children.items():
+        if not child.visits:
+            return action, child
+        bound = child.wins / child.visits + exploration * sqrt(log_visits / child.visits)
+        if bound > best_bound:
+            best, best_bound = (action, child), bound
+    return best
+
+def _search_worker(state, budget, seed, exploration, rollout_turns):
+    return search(state, budget, random.Random(seed), exploration, rollout_turns)
+
+class ComputerPlayer:
+    """ Plays a team with Monte Carlo tree search.
+
+        Searches run in the background on a pool of processes, one tree
+        per process, and their root statistics are added together to pick
+        the most visited action. `start` begins a search of at most
+        `budget` seconds and `poll` gives None until its action is ready,
+        so nothing waits on it. After each search, `nodes_per_second`
+        says how quickly the searches went.
+    """
+
+    def __init__(self, team, budget=1.0, processes=None, exploration=1.4, rollout_turns=20):
+        self.team = team
+        self.budget = budget
+        self.processes = processes or os.cpu_count()
+        self.exploration = exploration
+        self.rollout_turns = rollout_turns
+        self.nodes = 0
+        self.nodes_per_second = 0.0
+        self._pool = None
+        self._searches = []
+        self._started = None
+
+    def _executor(self):
+        if self._pool is None:
+            # Spawned, as forking a process with a window open isn't safe
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=get_context("spawn"))
+        return self._pool
+
+    def start(self, state):
+        pool = self._executor()
+        self._started = timer()
+        # Sent to the searches as it is now, whatever happens to it meanwhile
+        state = state.copy()
+        self._searches = [pool.submit(_search_worker, state, self.budget, random.getrandbits(64),
+                                      self.exploration, self.rollout_turns)
+                          for _ in range(self.processes)]
+
+    @property
+    def thinking(self):
+        return bool(self._searches)
+
+    def poll(self):
+        " The action chosen by the search, once it has finished, otherwise None "
+        if not self._searches or not all(search.done() for search in self._searches):
+            return None
+        visits, self.nodes = {}, 0
+        for finished in self._searches:
+            children, iterations = finished.result()
+            self.nodes += iterations
+            for action, (count, _) in children.items():
+                visits[action] = visits.get(action, 0) + count
+        self._searches = []
+        self.nodes_per_second = self.nodes / (timer() - self._started)
+        if not visits:
+            return PASS
+        return max(visits, key=visits.get)
+
+    def choose(self, state):
+        " Search state and wait for the action "
+        self.start(state)
+        wait(self._searches)
+        return self.poll()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,70 @@
+"""
+    Registry of named assets, loaded the first time they are needed
+"""
+
+class AssetRegistry:
+    """ Maps asset names to functions which load them.
+
+        Nothing is loaded when an asset is registered. The first `get`
+        calls its loader and remembers the result for every later call.
+        Assets can also be put in named groups so that a scene can load
+        everything it needs in one go, before it is shown.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._loaded = {}
+        self._groups = {}
+        self._prepares = {}
+
+    def register(self, name, loader, groups=(), prepare=None):
+        """ name: what the asset is looked up by
+            loader: callable with no arguments returning the asset
+            groups: names of the preload groups the asset belongs to
+            prepare: callable with no arguments doing the slow part of
+                loading which doesn't need the GL context, like decoding
+                files, so that it can be done on another thread first
+        """
+        self._loaders[name] = loader
+        if prepare is not None:
+            self._prepares[name] = prepare
+        for group in groups:
+            self._groups.setdefault(group, []).append(name)
+
+    def get(self, name):
+        try:
+            return self._loaded[name]
+        except KeyError:
+            asset = self._loaded[name] = self._loaders[name]()
+            return asset
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def preparation(self, name):
+        " The asset's prepare callable, or None if it doesn't have one "
+        return self._prepares.get(name)
+
+    def group(self, group):
+        " Names of the assets in group "
+        return list(self._groups.get(group, ()))
+
+    def preload(self, group):
+        " Load every asset in group which isn't loaded yet "
+        for name in self._groups.get(group, ()):
+            self.get(name)
+
+class Asset:
+    """ Class attribute standing in for a registered asset, which is only
+        loaded when the attribute is first read
+    """
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = registry if registry is not None else assets
+
+    def __get__(self, instance, owner):
+        return self.registry.get(self.name)
+
+# The registry everything in the game is loaded through
+assets = AssetRegistry()
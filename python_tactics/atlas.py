@@ -0,0 +1,196 @@
+"""
+    Packs every image the game uses into a few large texture pages
+
+    The packed pages and an index of where each image ended up are built
+    ahead of time, from the repositories root directory, with
+
+        python -m python_tactics.atlas
+
+    Images are looked up in the index by their path under assets/images
+    without the extension, such as "knight/face". Images listed in GRIDS
+    are cut into their frames first, named by their ImageGrid index, such
+    as "spaghetti_atlas/43". Mirrored images aren't packed, as flipping a
+    packed region only swaps its texture coordinates.
+"""
+import json
+import os
+import struct
+import zlib
+
+from python_tactics.texture_cache import textures
+
+PAGE_SIZE = 2048
+PADDING = 1
+
+# Images which are grids of frames: rows, columns
+GRIDS = {
+    "spaghetti_atlas" : (12, 24),
+    "unicorn_atlas"   : (12, 24),
+}
+
+def pack(sizes, page_size=PAGE_SIZE, padding=PADDING):
+    """ Places rectangles on as few page_size square pages as it can, in
+        shelves of decreasing height.
+
+        sizes: {name: (width, height)}
+        Returns {name: (page, x, y)} and the height each page used
+    """
+    placements, page_heights = {}, [0]
+    shelf_x, shelf_y, shelf_height = 0, 0, 0
+    by_height = sorted(sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0]))
+    for name, (width, height) in by_height:
+        if width > page_size or height > page_size:
+            raise ValueError(f"{name} is bigger than a {page_size} pixel page")
+        if shelf_x + width > page_size:
+            shelf_x, shelf_y, shelf_height = 0, shelf_y + shelf_height + padding, 0
+        if shelf_y + height > page_size:
+            page_heights.append(0)
+            shelf_x, shelf_y, shelf_height = 0, 0, 0
+        placements[name] = len(page_heights) - 1, shelf_x, shelf_y
+        shelf_x += width + padding
+        shelf_height = max(shelf_height, height)
+        page_heights[-1] = max(page_heights[-1], shelf_y + height)
+    return placements, page_heights
+
+class Pixels:
+    " Tightly packed RGBA rows, bottom row first "
+
+    def __init__(self, width, height, data=None):
+        self.width, self.height = width, height
+        self.data = bytearray(data if data is not None else width * height * 4)
+
+    def region(self, x, y, width, height):
+        pitch = self.width * 4
+        rows = (self.data[(y + row) * pitch + x * 4:(y + row) * pitch + (x + width) * 4]
+                for row in range(height))
+        return Pixels(width, height, b"".join(rows))
+
+    def paste(self, other, x, y):
+        pitch, other_pitch = self.width * 4, other.width * 4
+        for row in range(other.height):
+            start = (y + row) * pitch + x * 4
+            self.data[start:start + other_pitch] = other.data[row * other_pitch:(row + 1) * other_pitch]
+
+    def is_empty(self):
+        return not any(self.data[3::4])
+
+    def save(self, path):
+        " Write as an 8 bit RGBA PNG, which stores the top row first "
+        pitch = self.width * 4
+        # Every row starts with filter type 0, no filtering
+        raw = b"".join(b"\0" + self.data[row * pitch:(row + 1) * pitch]
+                       for row in reversed(range(self.height)))
+        with open(path, "wb") as png:
+            png.write(b"\x89PNG\r\n\x1a\n")
+            png.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height,
+                                                      8, 6, 0, 0, 0)))
+            png.write(_png_chunk(b"IDAT", zlib.compress(raw, 9)))
+            png.write(_png_chunk(b"IEND", b""))
+
+def _png_chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data)))
+
+def grid_frames(name, pixels):
+    " The frames of the grid image name which aren't empty, by their names "
+    rows, columns = GRIDS[name]
+    width, height = pixels.width // columns, pixels.height // rows
+    frames = {}
+    for row in range(rows):
+        for column in range(columns):
+            frame = pixels.region(column * width, row * height, width, height)
+            if not frame.is_empty():
+                frames[f"{name}/{row * columns + column}"] = frame
+    return frames
+
+def source_images(images_directory):
+    " Every image to pack, by name, including grid frames "
+    images = {}
+    for root, _, files in os.walk(images_directory):
+        for filename in sorted(files):
+            if not filename.endswith(".png"):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, images_directory)[:-len(".png")].replace(os.sep, "/")
+            decoded = textures.load(path)
+            pixels = Pixels(decoded.width, decoded.height,
+                            decoded.get_data("RGBA", decoded.width * 4))
+            if name in GRIDS:
+                images.update(grid_frames(name, pixels))
+            else:
+                images[name] = pixels
+    return images
+
+def build(images_directory, output_directory, page_size=PAGE_SIZE):
+    " Pack every image under images_directory, writing pages and index.json "
+    images = source_images(images_directory)
+    placements, page_heights = pack(
+        {name: (pixels.width, pixels.height) for name, pixels in images.items()}, page_size)
+    pages = [Pixels(page_size, height) for height in page_heights]
+    index = {"pages": [], "regions": {}}
+    for name, (page, x, y) in placements.items():
+        pixels = images[name]
+        pages[page].paste(pixels, x, y)
+        index["regions"][name] = [page, x, y, pixels.width, pixels.height]
+
+    os.makedirs(output_directory, exist_ok=True)
+    for number, page in enumerate(pages):
+        filename = f"page{number}.png"
+        page.save(os.path.join(output_directory, filename))
+        index["pages"].append(filename)
+    with open(os.path.join(output_directory, "index.json"), "w", encoding="utf-8") as index_file:
+        json.dump(index, index_file, indent=1, sort_keys=True)
+    return index
+
+class Atlas:
+    """ Looks up packed images in the pages written by `build`. When the
+        atlas hasn't been built, every lookup gives None, and images should
+        be loaded from their own files instead.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._regions = None
+        self._pages = []
+        self._textures = {}
+
+    def _load_index(self):
+        self._regions = {}
+        try:
+            with open(os.path.join(self.directory, "index.json"), encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        self._pages = index["pages"]
+        self._regions = index["regions"]
+
+    def __contains__(self, name):
+        if self._regions is None:
+            self._load_index()
+        return name in self._regions
+
+    def page_file(self, name):
+        " Path of the page the named image is packed into, or None "
+        if name not in self:
+            return None
+        return os.path.join(self.directory, self._pages[self._regions[name][0]])
+
+    def region(self, name):
+        " A new TextureRegion showing the named image, or None "
+        if name not in self:
+            return None
+        page, x, y, width, height = self._regions[name]
+        texture = self._textures.get(page)
+        if texture is None:
+            page_path = os.path.join(self.directory, self._pages[page])
+            texture = self._textures[page] = textures.load(page_path).get_texture()
+        return texture.get_region(x, y, width, height)
+
+def main():
+    #pylint: disable=import-outside-toplevel
+    from python_tactics.util import asset_to_file
+    built = build(asset_to_file("images"), asset_to_file("atlas"))
+    print("Packed %d images into %d pages" % (len(built["regions"]), len(built["pages"])))
+
+if __name__ == "__main__":
+    main()
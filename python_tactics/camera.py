@@ -95,6 +95,20 @@ class Camera:
             self.x, self.y, -1.0,
             0.0,    1.0,    0.0)
 
+    def to_world(self, x, y, width, height):
+        """ Returns the world x, y drawn at window pixel x, y, by undoing
+            the projection and model view set up in focus
+        """
+        aspect = width / height
+        return (self.x + (2 * x / width - 1) * self.scale * aspect,
+                self.y + (2 * y / height - 1) * self.scale)
+
+    def view_bounds(self, width, height):
+        " Returns the (left, bottom, right, top) of the world in view "
+        left, bottom = self.to_world(0, 0, width, height)
+        right, top = self.to_world(width, height, width, height)
+        return left, bottom, right, top
+
     #pylint: disable=no-self-use
     def hud_mode(self, width, height):
         glMatrixMode(GL_PROJECTION)
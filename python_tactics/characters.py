@@ -1,35 +1,58 @@
-import pyglet
+from functools import partial
+
+from python_tactics.assets import Asset, assets
+from python_tactics.game_state import BEEFY, RANGED, STATS
 from python_tactics.new_sprite import (Animation, Character, Direction,
                                        Environment, Image, sound_clip)
-from python_tactics.util import load_sprite_asset
+from python_tactics.util import (load_grid_frames, prefetch_grid_frames,
+                                 prefetch_images)
+
+# Standing frames of a character atlas: north, east, south, west
+FACE_FRAMES = 43, 41, 45, 46
 
 def anchor(img):
     img.anchor_x = int(img.width / 2)
     img.anchor_y = 25
     return img
 
+def atlas_faces(atlas):
+    " Standing images facing each direction, from a 12x24 character atlas "
+    north, east, south, west = load_grid_frames(atlas, FACE_FRAMES, 12, 24)
+    return {
+        Direction.NORTH : anchor(north),
+        Direction.EAST  : anchor(east),
+        Direction.SOUTH : anchor(south),
+        Direction.WEST  : anchor(west),
+        }
+
+def register_sound(name, sound_asset, groups):
+    " Sounds are decoded by prepare, as sound_clip shares what it loads "
+    clip = partial(sound_clip, sound_asset)
+    assets.register(name, clip, groups=groups, prepare=clip)
+
+assets.register("knight/profile", lambda: Image("knight/face.png"), groups=("game",),
+                prepare=lambda: prefetch_images("knight/face"))
+assets.register("knight/faces", lambda: atlas_faces("spaghetti_atlas"), groups=("game",),
+                prepare=lambda: prefetch_grid_frames("spaghetti_atlas", FACE_FRAMES))
+register_sound("knight/attack_sound", "50557__broumbroum__sf3_sfx_menu_back.wav", ("game",))
+assets.register("mage/profile", lambda: Image("mage/face.png"), groups=("game",),
+                prepare=lambda: prefetch_images("mage/face"))
+assets.register("mage/faces", lambda: atlas_faces("unicorn_atlas"), groups=("game",),
+                prepare=lambda: prefetch_grid_frames("unicorn_atlas", FACE_FRAMES))
+register_sound("mage/attack_sound", "50561__broumbroum__sf3_sfx_menu_select.wav", ("game",))
+assets.register("grass/face", lambda: Image("grass.png"))
+
 class Beefy(Character):
 
-    health   = 20
-    speed    = 3
-    range    = 1
-    strength = 10
-    defense  = 10
-    magic    = 0
+    kind = BEEFY
+    health, speed, range, strength, defense, magic = STATS[BEEFY][1:]
 
-    profile  = Image("knight/face.png")
-    attack_sound = sound_clip("50557__broumbroum__sf3_sfx_menu_back.wav")
+    profile  = Asset("knight/profile")
+    attack_sound = Asset("knight/attack_sound")
 
     class Sprite(Character.Sprite):
 
-        sprite_sheet = pyglet.image.ImageGrid(load_sprite_asset("spaghetti_atlas"), 12, 24)
-
-        faces = {
-            Direction.NORTH : anchor(sprite_sheet[43]),
-            Direction.EAST  : anchor(sprite_sheet[41]),
-            Direction.SOUTH : anchor(sprite_sheet[45]),
-            Direction.WEST  : anchor(sprite_sheet[46]),
-            }
+        faces = Asset("knight/faces")
 
         north_east_walk = Animation([
             # This references images i've removed. Will replace with things from atlas
@@ -50,26 +73,15 @@ class Ranged(Character):
     # 9,  41 NE
     # 11, 43 NW
 
-    health = 10
-    speed  = 2
-    range  = 4
-    strength = 5
-    defense  = 5
-    magic    = 5
+    kind = RANGED
+    health, speed, range, strength, defense, magic = STATS[RANGED][1:]
 
-    profile  = Image("mage/face.png")
-    attack_sound = sound_clip("50561__broumbroum__sf3_sfx_menu_select.wav")
+    profile  = Asset("mage/profile")
+    attack_sound = Asset("mage/attack_sound")
 
     class Sprite(Character.Sprite):
 
-        sprite_sheet = pyglet.image.ImageGrid(load_sprite_asset("unicorn_atlas"), 12, 24)
-
-        faces = {
-            Direction.NORTH : anchor(sprite_sheet[43]),
-            Direction.EAST  : anchor(sprite_sheet[41]),
-            Direction.SOUTH : anchor(sprite_sheet[45]),
-            Direction.WEST  : anchor(sprite_sheet[46]),
-            }
+        faces = Asset("mage/faces")
 
         north_east_walk = Animation([
             # This references images i've removed. Will replace with things from atlas
@@ -89,4 +101,4 @@ class Grass(Environment):
     occupiable = True
 
     class Sprite(Environment.Sprite):
-        face = Image("grass.png")
+        face = Asset("grass/face")
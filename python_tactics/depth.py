@@ -0,0 +1,48 @@
+"""
+    Batches characters so they are drawn back to front in one go
+"""
+from math import floor
+
+from pyglet.graphics import Batch, OrderedGroup
+
+
+class DepthBatch:
+    """ A Batch for characters and the UI floating over them.
+
+        The screen is cut into horizontal bands, one per row of tiles, and
+        each band gets an OrderedGroup so that characters further up the
+        screen, and so further away, are drawn first. A character is only
+        moved to another group when it crosses into another band. All of
+        the overlays are drawn after every character.
+    """
+
+    def __init__(self, band_height):
+        self.batch = Batch()
+        self.band_height = band_height
+        self.characters_group = OrderedGroup(0)
+        self.overlay_group = OrderedGroup(1)
+        self._band_groups = {}
+        self._bands = {}
+
+    def _band_group(self, band):
+        group = self._band_groups.get(band)
+        if group is None:
+            group = self._band_groups[band] = OrderedGroup(-band, self.characters_group)
+        return group
+
+    def place(self, character):
+        " Put character in the group for the band it is standing in "
+        band = floor(character.y / self.band_height)
+        if self._bands.get(character) != band:
+            self._bands[character] = band
+            character.sprite.group = self._band_group(band)
+
+    def update(self, characters):
+        for character in characters:
+            self.place(character)
+
+    def remove(self, character):
+        self._bands.pop(character, None)
+
+    def draw(self):
+        self.batch.draw()
@@ -0,0 +1,443 @@
+"""
+    The rules of a match, as plain data which never touches pyglet
+
+    Scenes draw a GameState and turn input into its actions, but anything
+    else, like simulations and computer players, can play matches with
+    it directly and as quickly as the rules can be run.
+
+    What a match is made of is persistent: units are never changed but
+    replaced, in a UnitRegistry of PVectors, so branching a state shares
+    all of it, and taking an action in a branch only copies what the
+    action touched.
+"""
+import copy
+import random
+from collections import namedtuple
+from enum import Enum
+
+from python_tactics.pathfinding import PathFinder
+from python_tactics.persistent import PVector
+from python_tactics.reachability import Reachability, cells_within
+from python_tactics.zobrist import cell_key, side_key, unit_key
+
+
+class Direction(Enum):
+    NORTH = 0
+    EAST = 1
+    SOUTH = 2
+    WEST = 3
+
+# The way a unit faces after taking a step of column, row
+STEP_FACING = {
+    (-1, 0) : Direction.NORTH,
+    (0, -1) : Direction.EAST,
+    (1, 0)  : Direction.SOUTH,
+    (0, 1)  : Direction.WEST,
+}
+
+class UnitStats(namedtuple("UnitStats", "name health speed range strength defense magic")):
+    " What a kind of unit is capable of "
+
+# Kinds of unit
+BEEFY, RANGED = 0, 1
+
+# Stats of every kind of unit, indexed by kind
+STATS = (
+    UnitStats("Beefy",  health=20, speed=3, range=1, strength=10, defense=10, magic=0),
+    UnitStats("Ranged", health=10, speed=2, range=4, strength=5,  defense=5,  magic=5),
+)
+
+# Kinds of action
+MOVE, ATTACK, END_TURN = 0, 1, 2
+
+class Action(namedtuple("Action", "kind unit target")):
+    """ Something the team whose turn it is can do. unit is the cell the
+        acting unit stands on and target is the cell it moves to or
+        attacks. Both are None for END_TURN
+    """
+
+PASS = Action(END_TURN, None, None)
+
+def starting_positions(width, height, team_size):
+    """ Starting positions on a width x height map for teams of `team_size`.
+        Result is a list per team of column, row and the direction
+        towards the center
+    """
+    starting_x = int((width - team_size) / 2)
+    starting_y = int((height - team_size) / 2)
+    sides = [[(x_side, starting_y + y_offset, direction) for y_offset in range(team_size)]
+             for x_side, direction in ((0, Direction.SOUTH), (width - 1, Direction.NORTH))]
+    ends = [[(starting_x + x_offset, y_side, direction) for x_offset in range(team_size)]
+            for y_side, direction in ((0, Direction.WEST), (height - 1, Direction.EAST))]
+    return sides + ends
+
+class Unit(namedtuple("Unit", "uid kind stats team i j facing health")):
+    """ One unit on the map, as it is at one point in a match. GameState
+        replaces it with an updated copy whenever it changes, keeping its
+        uid, which tells which unit it is
+    """
+
+    __slots__ = ()
+
+    @property
+    def position(self):
+        return self.i, self.j
+
+    def __repr__(self):
+        return f"{self.stats.name}(team={self.team}, at={self.position}, health={self.health})"
+
+class UnitRegistry:
+    """ The units on a map, indexed by everything the rules look them up
+        by: their uid, the cell they stand on, and their team.
+
+        All of it is persistent. `units` is a PVector by uid, with None
+        for units which have died. `cells` is a PVector holding the uid + 1
+        of the unit on each cell, and 0 for empty ones, so it is the
+        occupancy as well. `teams` is a tuple of each team's uids. Adding,
+        updating and removing units changes them all together, and a copy
+        shares them until either changes. Anything derived from `cells`
+        can tell it is stale by it being a different object.
+
+        `flat` is the occupancy again, as a bytearray for searches which
+        read lots of cells. Each change patches the cells it touched, and
+        a copy shares it until either changes, when that one copies it.
+
+        `hash` is the Zobrist hash of the occupied tiles, which is the same
+        for the same tiles however they came to be occupied.
+    """
+
+    __slots__ = ("_width", "_height", "units", "cells", "teams", "hash", "flat", "_owns_flat")
+
+    def __init__(self, width, height, team_count):
+        self._width, self._height = width, height
+        self.units = PVector()
+        self.cells = PVector.filled(0, width * height)
+        self.teams = ((),) * team_count
+        self.hash = 0
+        self.flat = bytearray(width * height)
+        self._owns_flat = True
+
+    def copy(self):
+        " A registry sharing everything with this one until either changes "
+        # Whichever changes first copies flat, leaving the other's alone
+        self._owns_flat = False
+        return copy.copy(self)
+
+    def __iter__(self):
+        " The units left "
+        return (unit for unit in self.units if unit is not None)
+
+    def get(self, uid):
+        " The unit with uid, or None if it has died "
+        return self.units[uid]
+
+    def at(self, i, j):
+        " The unit standing on the ith column and jth row, or None off the map "
+        if not (0 <= i < self._width and 0 <= j < self._height):
+            return None
+        uid = self.cells[i * self._height + j]
+        return self.units[uid - 1] if uid else None
+
+    def is_occupied(self, i, j):
+        if not (0 <= i < self._width and 0 <= j < self._height):
+            return False
+        return bool(self.flat[i * self._height + j])
+
+    def team(self, team):
+        " The units left on team "
+        units = self.units
+        return [units[uid] for uid in self.teams[team]]
+
+    def add(self, unit):
+        " Add unit, whose uid must be the number of units added so far "
+        self.units = self.units.append(unit)
+        self._set_team(unit.team, self.teams[unit.team] + (unit.uid,))
+        self._occupy(unit)
+
+    def skip(self):
+        " Use up a uid without adding a unit, as if one had died "
+        self.units = self.units.append(None)
+
+    def update(self, unit):
+        " Replace the unit with unit's uid by unit, wherever it now stands "
+        old = self.units[unit.uid]
+        if (old.i, old.j) != (unit.i, unit.j):
+            self._vacate(old)
+            self._occupy(unit)
+        self.units = self.units.set(unit.uid, unit)
+
+    def remove(self, unit):
+        self._vacate(unit)
+        self.units = self.units.set(unit.uid, None)
+        self._set_team(unit.team, tuple(uid for uid in self.teams[unit.team] if uid != unit.uid))
+
+    def _set_team(self, team, uids):
+        self.teams = self.teams[:team] + (uids,) + self.teams[team + 1:]
+
+    def _occupy(self, unit):
+        index = unit.i * self._height + unit.j
+        self.cells = self.cells.set(index, unit.uid + 1)
+        self.hash ^= cell_key(index)
+        self._set_flat(index, 1)
+
+    def _vacate(self, unit):
+        index = unit.i * self._height + unit.j
+        self.cells = self.cells.set(index, 0)
+        self.hash ^= cell_key(index)
+        self._set_flat(index, 0)
+
+    def _set_flat(self, index, occupied):
+        if not self._owns_flat:
+            self.flat = bytearray(self.flat)
+            self._owns_flat = True
+        self.flat[index] = occupied
+
+def distance(unit, other):
+    " Steps between two units, ignoring what is in the way "
+    return abs(unit.i - other.i) + abs(unit.j - other.j)
+
+class GameState:
+    """ A match: the map's movement costs, the units on it, and whose turn
+        it is.
+
+        Teams take turns, and a team's turn ends as soon as one of its
+        units moves or attacks. Every change goes through the methods
+        here, which keep the registry of units consistent, and `hash`,
+        the Zobrist hash of the units and the team to move, up to date.
+        Given a log, each action taken is recorded in it as well.
+
+        `branch` copies a state in constant time, however big the match,
+        to undo to or to search from.
+    """
+
+    __slots__ = ("width", "height", "costs", "team_count", "current_team", "turn",
+                 "registry", "stats", "rng", "pathfinder", "reachability",
+                 "hash", "table", "log")
+
+    def __init__(self, width, height, costs=None, team_count=2, stats=STATS, rng=None,
+                 table=None, log=None):
+        """ costs: flat column major movement costs, as taken by PathFinder
+            stats: UnitStats of each kind of unit
+            rng: source of the random numbers attacks roll, like
+                 random.Random. Defaults to the random module
+            table: TranspositionTable shared with copies of this state, to
+                   remember work like reachable cells between them
+            log: ActionLog recording every action taken. Copies don't
+                 share it
+        """
+        self.width, self.height = width, height
+        self.costs = costs if costs is not None else bytearray(b"\x01" * (width * height))
+        self.team_count = team_count
+        self.current_team = 0
+        self.turn = 0
+        self.registry = UnitRegistry(width, height, team_count)
+        self.stats = stats
+        self.rng = rng if rng is not None else random
+        self.table = table
+        self.log = log
+        self.pathfinder = PathFinder(width, height, self.costs)
+        self.reachability = Reachability(width, height, self.costs, self.registry, table)
+        self.hash = side_key(0)
+
+    @classmethod
+    def new_match(cls, width, height, team_size=2, team_count=2, **kwargs):
+        " A match with teams placed at the starting positions, alternating kinds "
+        state = cls(width, height, team_count=team_count, **kwargs)
+        for team, positions in enumerate(starting_positions(width, height, team_size)[:team_count]):
+            for count, (i, j, facing) in enumerate(positions):
+                state.add_unit(BEEFY if count % 2 == 0 else RANGED, team, i, j, facing)
+        return state
+
+    def branch(self):
+        """ A copy to take actions in independently of this state, with the
+            same log and a copy of its dice, so both roll the same
+        """
+        # Seeded with a constant rather than from the OS, which is slower,
+        # as setstate replaces all of its state anyway
+        rng = random.Random(0)
+        rng.setstate(self.rng.getstate())
+        return self._branch(rng, self.table, self.log)
+
+    def copy(self, rng=None, table=None):
+        """ A branch which records nothing, rolling attacks with rng or else
+            this state's rng, and sharing table or else this state's table
+        """
+        return self._branch(rng if rng is not None else self.rng,
+                            table if table is not None else self.table, None)
+
+    def _branch(self, rng, table, log):
+        state = GameState.__new__(GameState)
+        state.width, state.height, state.costs = self.width, self.height, self.costs
+        state.team_count, state.current_team, state.turn = self.team_count, self.current_team, self.turn
+        state.registry, state.hash = self.registry.copy(), self.hash
+        state.stats, state.rng, state.table, state.log = self.stats, rng, table, log
+        # Its buffers are only used during a query, so branches can share them
+        state.pathfinder = self.pathfinder
+        state.reachability = Reachability(self.width, self.height, self.costs, state.registry, table)
+        return state
+
+    def __getstate__(self):
+        " Everything but the rng, table, log and search buffers, so states can be sent to other processes "
+        units = [unit and (unit.kind, unit.team, unit.i, unit.j, unit.facing, unit.health)
+                 for unit in self.registry.units]
+        return (self.width, self.height, self.costs, self.team_count, self.stats,
+                self.current_team, self.turn, units)
+
+    def __setstate__(self, pickled):
+        width, height, costs, team_count, stats, current_team, turn, units = pickled
+        self.__init__(width, height, costs, team_count, stats)
+        self._start_turn(current_team, turn)
+        for unit in units:
+            if unit is None:
+                # Keeps the uids of the units after it
+                self.registry.skip()
+            else:
+                self.add_unit(*unit)
+
+    def _start_turn(self, team, turn):
+        self.hash ^= side_key(self.current_team) ^ side_key(team)
+        self.current_team, self.turn = team, turn
+
+    def _next_turn(self):
+        self._start_turn((self.current_team + 1) % self.team_count, self.turn + 1)
+
+    def _unit_key(self, unit):
+        return unit_key(unit.i * self.height + unit.j, unit.kind, unit.team,
+                        unit.facing.value, unit.health)
+
+    def add_unit(self, kind, team, i, j, facing=Direction.NORTH, health=None):
+        " Put a unit on the map, with full health unless given health "
+        stats = self.stats[kind]
+        unit = Unit(len(self.registry.units), kind, stats, team, i, j, facing,
+                    stats.health if health is None else health)
+        self.registry.add(unit)
+        self.hash ^= self._unit_key(unit)
+        return unit
+
+    @property
+    def units(self):
+        " The units left on the map "
+        return list(self.registry)
+
+    def current(self, unit):
+        " unit as it is now, or None if it has died "
+        return self.registry.get(unit.uid)
+
+    def team(self, team):
+        " The units left on team "
+        return self.registry.team(team)
+
+    def unit_at(self, cell):
+        " The unit standing on cell, or None "
+        return self.registry.at(*cell)
+
+    @property
+    def winner(self):
+        " The only team with units left, or None while the match is on "
+        teams = [team for team, uids in enumerate(self.registry.teams) if uids]
+        if len(teams) == 1:
+            return teams[0]
+        return None
+
+    def reachable(self, unit):
+        " The cells unit can move to "
+        return self.reachability.reachable(unit, unit.position, unit.stats.speed)
+
+    def in_range(self, unit):
+        " The cells unit can attack "
+        cells = cells_within(unit.position, unit.stats.range, self.width, self.height)
+        cells.discard(unit.position)
+        return cells
+
+    def targets(self, unit):
+        " The enemy units unit can attack "
+        return [other for team in range(self.team_count) if team != unit.team
+                for other in self.registry.team(team) if distance(unit, other) <= unit.stats.range]
+
+    def can_move(self, unit, cell):
+        return unit.team == self.current_team and cell in self.reachable(unit)
+
+    def can_attack(self, unit, target):
+        return (unit.team == self.current_team and target.team != unit.team
+                and distance(unit, target) <= unit.stats.range)
+
+    def move(self, unit, cell):
+        """ Walk unit to cell and end the turn. Returns the cells stepped
+            through, or None if unit can't move there
+        """
+        unit = self.current(unit)
+        if unit is None or not self.can_move(unit, cell):
+            return None
+        path = self.pathfinder.find_path(unit.position, cell, occupied=self.registry.flat)
+        if not path:
+            return None
+        previous = unit.position
+        self.hash ^= self._unit_key(unit)
+        last_step = path[-2] if len(path) > 1 else previous
+        unit = unit._replace(i=cell[0], j=cell[1],
+                             facing=STEP_FACING[cell[0] - last_step[0], cell[1] - last_step[1]])
+        self.registry.update(unit)
+        self.hash ^= self._unit_key(unit)
+        if self.log is not None:
+            self.log.record(Action(MOVE, previous, cell), turn=self.turn)
+        self._next_turn()
+        return path
+
+    def attack(self, unit, target):
+        """ Roll unit's attack on target and end the turn. Returns the
+            damage done, or None if unit can't attack target. Targets left
+            without health are removed
+        """
+        unit, target = self.current(unit), self.current(target)
+        if unit is None or target is None or not self.can_attack(unit, target):
+            return None
+        attack = self.rng.randrange(unit.stats.strength)
+        defense = self.rng.randrange(target.stats.defense)
+        hit = max(1, defense - attack)
+        self.hash ^= self._unit_key(target)
+        health = max(0, target.health - hit)
+        if health == 0:
+            self.registry.remove(target)
+        else:
+            target = target._replace(health=health)
+            self.registry.update(target)
+            self.hash ^= self._unit_key(target)
+        if self.log is not None:
+            self.log.record(Action(ATTACK, unit.position, target.position), hit, self.turn)
+        self._next_turn()
+        return hit
+
+    def end_turn(self):
+        " Pass, ending the turn without doing anything "
+        if self.log is not None:
+            self.log.record(PASS, turn=self.turn)
+        self._next_turn()
+
+    def actions(self):
+        """ Every Action the current team can take. Passing is only one of
+            them when nothing else is possible
+        """
+        actions = []
+        for unit in self.team(self.current_team):
+            actions.extend(Action(ATTACK, unit.position, target.position)
+                           for target in self.targets(unit))
+            actions.extend(Action(MOVE, unit.position, cell)
+                           for cell in sorted(self.reachable(unit)))
+        return actions or [PASS]
+
+    def apply(self, action):
+        """ Take action for the current team. Returns what move, attack or
+            end_turn returns, so None when the action isn't possible
+        """
+        if action.kind == END_TURN:
+            self.end_turn()
+            return True
+        unit = self.unit_at(action.unit)
+        if unit is None:
+            return None
+        if action.kind == MOVE:
+            return self.move(unit, action.target)
+        if action.kind != ATTACK:
+            return None
+        target = self.unit_at(action.target)
+        return self.attack(unit, target) if target is not None else None
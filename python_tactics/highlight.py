@@ -0,0 +1,71 @@
+"""
+    Keeps track of which map tiles are tinted, and why
+"""
+
+PLAIN    = 255, 255, 255
+SELECTED = 100, 100, 100
+HOVERED  = 180, 180, 180
+MOVEMENT = 100, 100, 255
+ATTACK   = 255, 100, 100
+
+class HighlightLayer:
+    """ Holds the selected and hovered cells along with the cells in
+        movement and attack range, and works out the tint of each tile
+        from them. Only tiles whose tint actually changes are passed to
+        `tint`, so nothing needs doing on frames where nothing changed.
+    """
+
+    def __init__(self, tint):
+        """ tint: callable taking a (column, row) and an (r, g, b) colour,
+                  which applies the colour to that tile
+        """
+        self._tint = tint
+        self._colors = {}
+        self.selected = None
+        self.hovered = None
+        self.movement = frozenset()
+        self.attack = frozenset()
+
+    def select(self, cell):
+        last, self.selected = self.selected, cell
+        self._refresh((last, cell))
+
+    def hover(self, cell):
+        last, self.hovered = self.hovered, cell
+        self._refresh((last, cell))
+
+    def show_movement(self, cells):
+        last, self.movement = self.movement, frozenset(cells)
+        self._refresh(last ^ self.movement)
+
+    def show_attack(self, cells):
+        last, self.attack = self.attack, frozenset(cells)
+        self._refresh(last ^ self.attack)
+
+    def clear(self):
+        " Stop showing movement and attack ranges "
+        self.show_movement(())
+        self.show_attack(())
+
+    def color_of(self, cell):
+        if cell == self.selected:
+            return SELECTED
+        if cell == self.hovered:
+            return HOVERED
+        if cell in self.movement:
+            return MOVEMENT
+        if cell in self.attack:
+            return ATTACK
+        return PLAIN
+
+    def _refresh(self, cells):
+        for cell in cells:
+            if cell is None:
+                continue
+            color = self.color_of(cell)
+            if self._colors.get(cell, PLAIN) != color:
+                self._tint(cell, color)
+                if color == PLAIN:
+                    del self._colors[cell]
+                else:
+                    self._colors[cell] = color
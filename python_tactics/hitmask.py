@@ -0,0 +1,55 @@
+"""
+    Which pixels of an image are opaque, for clicking on exactly what shows
+
+    Never imports pyglet, so masks can be built and tested without a window.
+"""
+from weakref import WeakKeyDictionary
+
+# Turns alpha values into the digits of a base 2 number: transparent or not
+_OPAQUE_DIGITS = bytes.maketrans(bytes(range(256)), b"0" + b"1" * 255)
+
+class HitMask:
+    """ One bit per pixel of an image, set wherever the pixel isn't fully
+        transparent. Rows run from the bottom of the image to the top, the
+        same as pyglet's image data
+    """
+
+    __slots__ = ("width", "height", "bits")
+
+    def __init__(self, width, height, alpha, reverse=False):
+        """ alpha: bytes with one alpha value per pixel, tightly packed
+            reverse: mirror the mask left to right, for flipped images
+        """
+        self.width, self.height = width, height
+        if reverse:
+            alpha = b"".join(alpha[start:start + width][::-1]
+                             for start in range(0, width * height, width))
+        # Reversed so that the first pixel ends up as the lowest bit
+        digits = alpha[:width * height].translate(_OPAQUE_DIGITS)[::-1] or b"0"
+        self.bits = int(digits, 2).to_bytes((width * height + 7) // 8, "little")
+
+    @classmethod
+    def from_image(cls, image):
+        """ Builds the mask from an image's decoded pixel data. Images marked
+            `requires_reverse` show their pixels mirrored
+        """
+        data = image.get_image_data()
+        return cls(data.width, data.height, data.get_data("A", data.width),
+                   reverse=hasattr(image, "requires_reverse"))
+
+    def __getitem__(self, pixel):
+        x, y = pixel
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        index = y * self.width + x
+        return bool(self.bits[index >> 3] >> (index & 7) & 1)
+
+# Masks are shared by every sprite showing the same image, and go away with it
+HIT_MASKS = WeakKeyDictionary()
+
+def hit_mask(image):
+    " Returns the shared HitMask for image, building it the first time "
+    mask = HIT_MASKS.get(image)
+    if mask is None:
+        mask = HIT_MASKS[image] = HitMask.from_image(image)
+    return mask
@@ -0,0 +1,65 @@
+"""
+    Menus and overlays which are built once and stay put on screen
+"""
+from pyglet.graphics import Batch, OrderedGroup
+from pyglet.image import SolidColorImagePattern
+from pyglet.sprite import Sprite
+from pyglet.text import Label
+
+_SOLID_IMAGES = {}
+
+def solid_image(color, width, height):
+    " Returns a shared image of the given size filled with color "
+    key = color, width, height
+    image = _SOLID_IMAGES.get(key)
+    if image is None:
+        image = _SOLID_IMAGES[key] = SolidColorImagePattern(color).create_image(width, height)
+    return image
+
+class Hud:
+    """ A batch of overlays and labels placed relative to the bottom left
+        of the window rather than the world.
+
+        Everything is created once. When the camera has moved since the
+        last draw, everything is moved along with it, otherwise drawing is
+        just drawing the batch.
+    """
+
+    def __init__(self):
+        self.batch = Batch()
+        self.background = OrderedGroup(0)
+        self.foreground = OrderedGroup(1)
+        self._items = {}
+        self._camera_at = None
+
+    def add_overlay(self, color, width, height, x, y):
+        " Add a width by height rectangle of color, centred on x, y "
+        sprite = Sprite(solid_image(color, width, height),
+                        batch=self.batch, group=self.background)
+        # Sprites are positioned by their bottom left corner
+        self._items[sprite] = x - width / 2, y - height / 2
+        self._camera_at = None
+        return sprite
+
+    def add_label(self, text, x, y, **kwargs):
+        " Add a Label with its position x, y pixels from the bottom left "
+        label = Label(text, batch=self.batch, group=self.foreground, **kwargs)
+        self._items[label] = x, y
+        self._camera_at = None
+        return label
+
+    def move(self, item, x, y):
+        self._items[item] = x, y
+        self._camera_at = None
+
+    def follow(self, camera):
+        " Reposition everything if the camera has moved "
+        if self._camera_at == (camera.x, camera.y):
+            return
+        self._camera_at = camera.x, camera.y
+        for item, (x, y) in self._items.items():
+            item.x, item.y = camera.to_xy_from_bottom_left(x, y)
+
+    def draw(self, camera):
+        self.follow(camera)
+        self.batch.draw()
@@ -1,60 +1,94 @@
-from python_tactics.new_sprite import Direction
+from array import array
+from math import ceil, floor
+
+# Kinds of tile a map can be made of
+GRASS = 0
 
 class Map:
+    """ An isometric grid of tiles, stored column major in flat parallel
+        arrays indexed by `i * height + j`.
+
+        Column i runs down and to the right of the origin, row j runs down
+        and to the left, so the ith column and jth row is drawn at
+
+            x = origin_x + (i - j) * tile_width / 2
+            y = origin_y - (i + j) * tile_height / 2
+
+        and screen positions map back to tiles by inverting that.
+    """
 
-    def __init__(self, width, height):
+    __slots__ = ("_width", "_height", "_origin_x", "_origin_y",
+                 "_half_width", "_half_height",
+                 "kinds", "heights", "costs", "xs", "ys")
+
+    def __init__(self, width, height, origin=(0, 0), tile_size=(100, 50)):
+        """ width, height: number of columns and rows
+            origin: (x, y) Where the 0th column and 0th row is drawn
+            tile_size: (width, height) of the diamond each tile covers
+        """
         self._width, self._height = width, height
-        self._sprites = []
-        self._coordinates = []
-        for _ in range(width):
-            self._sprites.append([None for _ in range(height)])
-            self._coordinates.append([None for _ in range(height)])
-        self._rowcolumn = {}
+        self._origin_x, self._origin_y = origin
+        self._half_width, self._half_height = tile_size[0] / 2, tile_size[1] / 2
+        size = width * height
+        self.kinds = array("B", bytes(size))
+        self.heights = array("h", bytes(2 * size))
+        self.costs = array("B", b"\x01" * size)
+        # x only depends on i - j and y on i + j, so each column is a slice
+        # of the values along the diagonals, copied without any arithmetic
+        across = array("f", (self._origin_x + diagonal * self._half_width
+                             for diagonal in range(width - 1, -height, -1)))
+        down = array("f", (self._origin_y - diagonal * self._half_height
+                           for diagonal in range(width + height - 1)))
+        self.xs, self.ys = array("f"), array("f")
+        for i in range(width):
+            self.xs.extend(across[width - 1 - i:width - 1 - i + height])
+            self.ys.extend(down[i:i + height])
 
     @property
-    def sprites(self):
-        for column in self._sprites:
-            for sprite in column:
-                yield sprite
+    def width(self):
+        return self._width
 
     @property
-    def coordinates(self):
-        return self._coordinates
-
-    def get_starting_positions(self, team_size):
-        """Returns starting positions on this map for a team of size `team_size`.
-           Result is pairs of coordinates and a direction, which is the direction towards the center"""
-        starting_x = int((self._width - team_size) / 2)
-        starting_y = int((self._height - team_size) / 2)
-        return [[(x_side, starting_y + y_offset, direction) for y_offset in range(team_size)] for x_side, direction in ((0, Direction.SOUTH), (self._width - 1, Direction.NORTH))] \
-             + [[(starting_x + x_offset, y_side, direction) for x_offset in range(team_size)] for y_side, direction in ((0, Direction.WEST), (self._height - 1, Direction.EAST))]
+    def height(self):
+        return self._height
 
+    def contains(self, i, j):
+        return 0 <= i < self._width and 0 <= j < self._height
 
-    def add_sprite(self, i, j, sprite):
-        " Add the given sprite to the map at ith column and jth row "
-        if 0 <= i < self._width and 0 <= j < self._height:
-            self._sprites[i][j] = sprite
-            self._coordinates[i][j] = (sprite.x, sprite.y)
-            self._rowcolumn[(sprite.x, sprite.y)] = (i, j)
+    def set_tile(self, i, j, kind, height=0, cost=1):
+        " Set what the tile at the ith column and jth row is made of "
+        index = i * self._height + j
+        self.kinds[index] = kind
+        self.heights[index] = height
+        self.costs[index] = cost
 
     def get_coordinates(self, i, j):
         " Get the x, y coordinates for the ith column and jth row "
-        return self._coordinates[i][j]
+        return (self._origin_x + (i - j) * self._half_width,
+                self._origin_y - (i + j) * self._half_height)
 
-    def get_row_column(self, x, y):
-        " Get the row, column pair for the given x,y "
-        return self._rowcolumn[(x, y)]
-
-    def get_sprite(self, i, j):
-        " Get the sprite at the ith column and jth row "
-        if 0 <= i < self._width and 0 <= j < self._height:
-            return self._sprites[i][j]
+    def tile_at(self, x, y):
+        """ Get the column, row pair of the tile whose diamond x,y falls
+            within, or None if it is off the map
+        """
+        across = (x - self._origin_x) / self._half_width
+        down = (self._origin_y - y) / self._half_height
+        i, j = floor((down + across) / 2 + 0.5), floor((down - across) / 2 + 0.5)
+        if self.contains(i, j):
+            return i, j
         return None
 
-    def find_sprite(self, x, y):
-        " Get the sprite which the given x,y falls within "
-        for column in self._sprites:
-            for sprite in column:
-                if sprite.contains(x, y):
-                    return sprite
-        return None
+    def tile_range(self, left, bottom, right, top):
+        """ Get the first and last column and row, (i, i', j, j'), of the
+            tiles with their centre inside the given rectangle, or None if
+            it doesn't cover the map
+        """
+        corners = [((x - self._origin_x) / self._half_width, (self._origin_y - y) / self._half_height)
+                   for x in (left, right) for y in (bottom, top)]
+        columns = [(down + across) / 2 for across, down in corners]
+        rows = [(down - across) / 2 for across, down in corners]
+        first_column, last_column = max(0, ceil(min(columns))), min(self._width - 1, floor(max(columns)))
+        first_row, last_row = max(0, ceil(min(rows))), min(self._height - 1, floor(max(rows)))
+        if first_column > last_column or first_row > last_row:
+            return None
+        return first_column, last_column, first_row, last_row
@@ -0,0 +1,123 @@
+"""
+    Walks every character in a scene along its path at once
+"""
+from array import array
+from collections import deque
+
+from python_tactics.game_state import Direction
+
+
+class Motion:
+    """ Where every character is and where it is walking to, held as a
+        struct of arrays with one slot per character, so a tick is one loop
+        over plain numbers rather than a method call per character.
+
+        Each slot walks a queue of legs, straight lines to a point taking a
+        number of seconds. `tick` only visits slots with a leg to walk, so
+        it costs the same however many characters are standing still, and
+        returns the owners of the slots it moved, so only their sprites
+        need updating.
+    """
+
+    __slots__ = ("xs", "ys", "facings", "moving", "_from_xs", "_from_ys", "_to_xs", "_to_ys",
+                 "_elapsed", "_durations", "_queues", "_owners", "_free", "_active")
+
+    def __init__(self):
+        self.xs, self.ys = array("d"), array("d")
+        # Direction values, and 1 for the slots walking a leg
+        self.facings, self.moving = array("B"), bytearray()
+        self._from_xs, self._from_ys = array("d"), array("d")
+        self._to_xs, self._to_ys = array("d"), array("d")
+        self._elapsed, self._durations = array("d"), array("d")
+        self._queues = []
+        self._owners = []
+        self._free = []
+        # Slots with a leg to walk, in the order they started walking
+        self._active = {}
+
+    def __len__(self):
+        return len(self._owners) - len(self._free)
+
+    def add(self, owner, x, y, facing=Direction.NORTH):
+        " Give owner a slot, standing at x, y facing a Direction. Returns the slot "
+        if self._free:
+            slot = self._free.pop()
+            self._owners[slot] = owner
+        else:
+            slot = len(self._owners)
+            for values in (self.xs, self.ys, self._from_xs, self._from_ys,
+                           self._to_xs, self._to_ys, self._elapsed, self._durations):
+                values.append(0.0)
+            self.facings.append(0)
+            self.moving.append(0)
+            self._queues.append(deque())
+            self._owners.append(owner)
+        self.xs[slot], self.ys[slot] = x, y
+        self.facings[slot] = facing.value
+        return slot
+
+    def remove(self, slot):
+        " Free slot, stopping it wherever it is "
+        self._owners[slot] = None
+        self._queues[slot].clear()
+        self._active.pop(slot, None)
+        self.moving[slot] = 0
+        self._free.append(slot)
+
+    def place(self, slot, x, y):
+        " Put slot at x, y, without walking "
+        self.xs[slot], self.ys[slot] = x, y
+
+    def move_to(self, slot, x, y, duration=1):
+        " Queue a leg for slot, walking in a straight line to x, y over duration seconds "
+        self._queues[slot].append((x, y, duration))
+        if slot not in self._active:
+            self._active[slot] = None
+            self._start_leg(slot)
+
+    def _start_leg(self, slot):
+        to_x, to_y, duration = self._queues[slot].popleft()
+        from_x, from_y = self.xs[slot], self.ys[slot]
+        self._from_xs[slot], self._from_ys[slot] = from_x, from_y
+        self._to_xs[slot], self._to_ys[slot] = to_x, to_y
+        self._elapsed[slot], self._durations[slot] = 0.0, duration
+        self.moving[slot] = 1
+        # Which way the leg runs across the screen, as the map is drawn
+        if to_x < from_x and to_y < from_y:
+            facing = Direction.WEST
+        elif to_x < from_x:
+            facing = Direction.NORTH
+        elif to_y < from_y:
+            facing = Direction.SOUTH
+        else:
+            facing = Direction.EAST
+        self.facings[slot] = facing.value
+
+    def tick(self, time_delta):
+        """ Walk every slot with a leg to walk on by time_delta seconds.
+            Returns the owners of the slots which moved, including those
+            which have just stopped
+        """
+        if not self._active:
+            return []
+        xs, ys, elapsed, durations = self.xs, self.ys, self._elapsed, self._durations
+        from_xs, from_ys, to_xs, to_ys = self._from_xs, self._from_ys, self._to_xs, self._to_ys
+        owners, moved = self._owners, []
+        for slot in list(self._active):
+            spent = elapsed[slot] + time_delta
+            duration = durations[slot]
+            if spent >= duration:
+                xs[slot], ys[slot] = to_xs[slot], to_ys[slot]
+                if self._queues[slot]:
+                    self._start_leg(slot)
+                else:
+                    del self._active[slot]
+                    self.moving[slot] = 0
+            else:
+                elapsed[slot] = spent
+                along = spent / duration
+                from_x, from_y = from_xs[slot], from_ys[slot]
+                xs[slot] = from_x + (to_xs[slot] - from_x) * along
+                ys[slot] = from_y + (to_ys[slot] - from_y) * along
+            moved.append(owners[slot])
+        return moved
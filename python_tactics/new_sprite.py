@@ -26,41 +26,50 @@
 #   * @image - The current image the element should show
 
 import os
+from array import array
+from bisect import bisect_right
 from collections import namedtuple
-from enum import Enum
-from functools import reduce
+from functools import lru_cache
+from math import floor
 
-from pyglet import graphics, image, media
+from pyglet import graphics, media
 from pyglet.sprite import Sprite
 from pyglet.text import Label
 
-from python_tactics.util import asset_to_file
+# Direction lives with the rules, which don't need pyglet
+from python_tactics.game_state import Direction
+from python_tactics.hitmask import hit_mask
+from python_tactics.motion import Motion
+from python_tactics.util import asset_to_file, load_image, transformed
 
+_FACINGS = {direction.value: direction for direction in Direction}
 
-class Direction(Enum):
-    NORTH = 0
-    EAST = 1
-    SOUTH = 2
-    WEST = 3
-
+@lru_cache(maxsize=None)
 def sound_clip(sound_asset):
+    " Decoded sound, shared by everything which plays it "
     return media.load(asset_to_file(os.path.join("sounds", sound_asset)), streaming=False)
 
 class Image:
 
-    def __init__(self, image_asset):
-        self._image = image.load(asset_to_file(os.path.join("images", image_asset)))
-        self._image.anchor_x = int(self._image.width / 2)
-        self._image.anchor_y = int(self._image.height)
+    def __init__(self, image_asset=None, image=None, flipped=None):
+        """ image_asset: file under assets/images to show, anchored at the
+                         middle of its top edge
+            image: pyglet image to show instead, as it is
+            flipped: Image showing this one mirrored, if there is one yet
+        """
+        if image is None:
+            image = load_image(os.path.splitext(image_asset)[0])
+            image.anchor_x = int(image.width / 2)
+            image.anchor_y = int(image.height)
+        self._image = image
+        self._flipped = flipped
 
     @property
     def flipped_about_x(self):
-        anchor_x, anchor_y = self._image.anchor_x, self._image.anchor_y
-        width, height = self._image.width, self._image.height
-        self._image = self._image.get_texture().get_transform(flip_x=True)
-        self._image.anchor_x = width - anchor_x
-        self._image.anchor_y = height - anchor_y
-        return self
+        " This image mirrored left to right, made once and then shared "
+        if self._flipped is None:
+            self._flipped = Image(image=transformed(self._image, flip_x=True), flipped=self)
+        return self._flipped
 
     def get_texture(self):
         return self._image.get_texture()
@@ -72,41 +81,86 @@ class Frame(namedtuple("Frame", "image duration")):
 
     @property
     def flipped_about_x(self):
+        " A frame showing the shared flipped copy of this frame's image "
         return Frame(self.image.flipped_about_x, self.duration)
 
-class Animation(namedtuple("Animation", "frames amount_played")):
+class AnimationClock:
+    """ Time every Animation is played against. Ticked once a frame, so
+        that everything showing an animation shares one lookup of which
+        image it is on per frame. `speed` scales how quickly time passes.
+    """
 
-    @property
-    def duration(self):
-        return reduce(lambda d, f: f.duration + d, self.frames, 0.0)
+    __slots__ = ("time", "frame", "speed")
+
+    def __init__(self):
+        self.time = 0.0
+        self.frame = 0
+        self.speed = 1.0
+
+    def tick(self, time_delta):
+        self.time += time_delta * self.speed
+        self.frame += 1
+
+# The clock animations play against unless given another
+animation_clock = AnimationClock()
+
+class Animation:
+    """ Frames played on a loop, compiled once into the time each frame
+        ends, so the current frame is found with a binary search.
+
+        offset: how far into the loop the animation is at time 0
+        flipped: Animation showing this one mirrored, if there is one yet
+    """
+
+    __slots__ = ("frames", "offset", "duration", "clock", "_ends",
+                 "_shown_on", "_image", "_flipped")
+
+    def __init__(self, frames, offset=0.0, clock=None, flipped=None):
+        self.frames = tuple(frames)
+        self.offset = offset
+        self.clock = clock if clock is not None else animation_clock
+        self._ends = array("d")
+        elapsed = 0.0
+        for frame in self.frames:
+            elapsed += frame.duration
+            self._ends.append(elapsed)
+        self.duration = elapsed
+        self._shown_on = None
+        self._image = None
+        self._flipped = flipped
+
+    def image_at(self, time):
+        " The image shown time seconds in, or None without any frames "
+        if not self.duration:
+            return self.frames[0].image if self.frames else None
+        index = bisect_right(self._ends, (time + self.offset) % self.duration)
+        return self.frames[min(index, len(self.frames) - 1)].image
 
     @property
     def image(self):
-        accum = 0.0
-        for frame in self.frames:
-            accum = accum + frame.duration
-            if accum > self.amount_played:
-                return frame.image
-        return self.frames[0]
+        " The image shown now, worked out once per clock tick "
+        clock = self.clock
+        if self._shown_on != clock.frame:
+            self._shown_on = clock.frame
+            self._image = self.image_at(clock.time)
+        return self._image
 
     @property
     def flipped_about_x(self):
-        return Animation(
-                [frame.flipped_about_x for frame in self.frames],
-                self.amount_played)
-
-
-    def tick(self, time_delta):
-        return Animation(self.frames, (self.amount_played + time_delta) % self.duration)
+        " This animation mirrored left to right, made once and then shared "
+        if self._flipped is None:
+            self._flipped = Animation([frame.flipped_about_x for frame in self.frames],
+                                      self.offset, self.clock, flipped=self)
+        return self._flipped
 
 SpriteBase = namedtuple("SpriteBase", "x y")
 
 class Health:
-    def __init__(self, current_health, max_health, x, y, y_offset):
+    def __init__(self, current_health, max_health, x, y, y_offset, batch=None, group=None):
         self.current_health = current_health
         self.max_health = max_health
         self.y_offset = y_offset
-        self.sprite = self._create_sprite(x, y)
+        self.sprite = self._create_sprite(x, y, batch, group)
 
     def draw(self):
         self.sprite.draw()
@@ -127,6 +181,14 @@ class Health:
     def y(self, y):
         self.sprite.y = y + (self.y_offset - 20)
 
+    def place(self, x, y):
+        " Move over x, y, setting only what changed, as each set moves the label's vertices "
+        label, y = self.sprite, y + (self.y_offset - 20)
+        if label.x != x:
+            label.x = x
+        if label.y != y:
+            label.y = y
+
     def hit(self, attack):
         self.current_health = max(0, self.current_health - attack)
         self.sprite.text = self._create_label_text()
@@ -135,14 +197,16 @@ class Health:
     def delete(self):
         self.sprite.delete()
 
-    def _create_sprite(self, x, y):
+    def _create_sprite(self, x, y, batch, group):
         return Label(text=self._create_label_text(),
                      font_name='Times New Roman',
                      font_size=18,
                      bold=True,
                      x=x,
                      y=y + (self.y_offset - 20),
-                     anchor_x='center')
+                     anchor_x='center',
+                     batch=batch,
+                     group=group)
 
     def _create_label_text(self):
         return f"{self.current_health}/{self.max_health}"
@@ -150,13 +214,21 @@ class Health:
 
 class Character:
 
-    def __init__(self, x, y, facing=Direction.NORTH):
-        self.facing = facing
-        self.movement_queue = []
-        self.movement_ticks = 0
-        self.sprite = Sprite(self.Sprite.faces[facing], x, y)
-        self.health = Health(self.health, self.health, x, y, self.sprite.height)
-        self.last_stop = (self.x, self.y)
+    def __init__(self, x, y, facing=Direction.NORTH, batch=None, group=None, overlay_group=None,
+                 health=None, motion=None):
+        """ batch: Batch to draw the character and its health with
+            group: Group the character is drawn in
+            overlay_group: Group the health is drawn in
+            health: health left, defaults to full health
+            motion: Motion walking the character, shared by every character
+                    in a scene so they are all walked in one tick
+        """
+        self.motion = motion if motion is not None else Motion()
+        self.slot = self.motion.add(self, x, y, facing)
+        self.sprite = Sprite(self.Sprite.faces[facing], x, y, batch=batch, group=group)
+        self.health = Health(self.health if health is None else health, self.health,
+                             x, y, self.sprite.height,
+                             batch=batch, group=overlay_group)
 
     def draw_character(self):
         self.sprite.draw()
@@ -165,6 +237,7 @@ class Character:
         self.health.draw()
 
     def delete(self):
+        self.motion.remove(self.slot)
         self.health.delete()
         self.sprite.delete()
 
@@ -174,6 +247,7 @@ class Character:
 
     @x.setter
     def x(self, x):
+        self.motion.place(self.slot, x, self.y)
         self.sprite.x = x
         self.health.x = x
 
@@ -183,9 +257,14 @@ class Character:
 
     @y.setter
     def y(self, y):
+        self.motion.place(self.slot, self.x, y)
         self.sprite.y = y
         self.health.y = y
 
+    @property
+    def facing(self):
+        return _FACINGS[self.motion.facings[self.slot]]
+
     @property
     def color(self):
         return self.sprite.color
@@ -194,36 +273,45 @@ class Character:
     def color(self, ncolor):
         self.sprite.color = ncolor
 
-    def look(self, direction):
-        self.facing = direction
-        self.sprite.image = self.Sprite.faces[direction]
+    def contains(self, x, y):
+        " Whether x, y falls on an opaque pixel of the character as it's shown now "
+        sprite = self.sprite
+        image = sprite.image
+        column = floor((x - sprite.x) / sprite.scale + image.anchor_x)
+        row = floor((y - sprite.y) / sprite.scale + image.anchor_y)
+        if not (0 <= column < image.width and 0 <= row < image.height):
+            return False
+        return hit_mask(image)[column, row]
+
+    def look(self, direction, moving=False):
+        image = None
+        if moving:
+            walking = getattr(self.Sprite, "walking_animations", {}).get(direction)
+            frame = walking.image if walking is not None else None
+            image = frame.get_texture() if frame is not None else None
+        image = image or self.Sprite.faces[direction]
+        # Setting the image rebuilds the sprite's vertices, even if it is the same
+        if self.sprite.image is not image:
+            self.sprite.image = image
 
     def move_to(self, x, y, duration=1):
-        self.movement_queue.append((x, y, duration))
+        self.motion.move_to(self.slot, x, y, duration)
+
+    def follow(self):
+        " Show the character where its motion has walked it to, facing the way it walks "
+        motion, slot = self.motion, self.slot
+        x, y = motion.xs[slot], motion.ys[slot]
+        sprite = self.sprite
+        if sprite.x != x or sprite.y != y:
+            # One vertex update for both, rather than one for each
+            sprite.position = (x, y)
+            self.health.place(x, y)
+        self.look(_FACINGS[motion.facings[slot]], moving=motion.moving[slot])
 
     def tick(self, time_delta):
-        if self.movement_queue:
-            dest_x, dest_y, time = self.movement_queue[0]
-            last_x, last_y = self.last_stop
-            if dest_x < last_x and dest_y < last_y:
-                self.look(Direction.WEST)
-            elif dest_x < last_x:
-                self.look(Direction.NORTH)
-            elif dest_y < last_y:
-                self.look(Direction.SOUTH)
-            else:
-                self.look(Direction.EAST)
-            self.movement_ticks += time_delta
-            self.x += (dest_x - last_x) * (time_delta / time)
-            self.y += (dest_y - last_y) * (time_delta / time)
-
-            if self.movement_ticks >= time:
-                self.x, self.y = int(dest_x), int(dest_y)
-                del self.movement_queue[0]
-                self.movement_ticks = 0
-                self.last_stop = (self.x, self.y)
-        else:
-            self.look(self.facing)
+        " Walk on by time_delta, for a character with a Motion of its own "
+        for character in self.motion.tick(time_delta):
+            character.follow()
 
     def hit(self, attack):
         return self.health.hit(attack)
@@ -0,0 +1,131 @@
+"""
+    Weighted A* search over the (column, row) grid of a Map
+"""
+from heapq import heappop, heappush
+
+# Tiles which can never be entered have this movement cost
+IMPASSABLE = 0
+
+def neighbours(index, width, height):
+    """ Indexes of the cells next to the one at index on a width x height
+        grid, column major, leaving out those off the grid. Moving along a
+        column changes the row by 1, moving along a row changes the column
+        and so the index by height
+    """
+    column, row = divmod(index, height)
+    found = []
+    if row:
+        found.append(index - 1)
+    if column:
+        found.append(index - height)
+    if column + 1 < width:
+        found.append(index + height)
+    if row + 1 < height:
+        found.append(index + 1)
+    return found
+
+class PathFinder:
+    """ Finds the cheapest path between two cells of a width x height grid.
+
+        Cells are indexed column major, `column * height + row`, the same
+        way Map lays out its tiles. Search buffers are allocated once and
+        reused between queries, with a generation stamp standing in for
+        clearing them.
+    """
+
+    def __init__(self, width, height, costs=None, occupied=None):
+        """ width, height: size of the grid in columns and rows
+            costs: flat sequence with the cost of entering each cell,
+                   IMPASSABLE for cells which can't be entered. Defaults
+                   to every cell costing 1
+            occupied: flat sequence, truthy for cells something is
+                      standing on. Those can't be walked through
+        """
+        self.width, self.height = width, height
+        self.costs = costs if costs is not None else [1] * (width * height)
+        self.occupied = occupied if occupied is not None else bytearray(width * height)
+        self._g_score = []
+        self._parent = []
+        self._opened = []
+        self._closed = []
+        self._generation = 0
+        self._heap = []
+
+    def _reset(self):
+        size = self.width * self.height
+        if len(self._opened) != size:
+            self._g_score = [0] * size
+            self._parent = [0] * size
+            self._opened = [0] * size
+            self._closed = [0] * size
+            self._generation = 0
+        self._generation += 1
+        del self._heap[:]
+        return self._generation
+
+    def find_path(self, start, end, blocked=(), occupied=None):
+        """ Returns the cells to step through to get from start to end,
+            not including start. An empty list means start is end, and
+            None means end can't be reached.
+
+            blocked: extra cells which can't be entered for this query
+            occupied: flat sequence used instead of the finder's own
+                      occupied cells for this query
+        """
+        width, height = self.width, self.height
+        start_column, start_row = start
+        end_column, end_row = end
+        if not (0 <= end_column < width and 0 <= end_row < height):
+            return None
+        if start == end:
+            return []
+        end_index = end_column * height + end_row
+        costs = self.costs
+        if occupied is None:
+            occupied = self.occupied
+        if end in blocked or costs[end_index] == IMPASSABLE or occupied[end_index]:
+            return None
+
+        generation = self._reset()
+        g_score, parent = self._g_score, self._parent
+        opened, closed, heap = self._opened, self._closed, self._heap
+        blocked_indexes = {column * height + row for column, row in blocked
+                           if 0 <= column < width and 0 <= row < height}
+
+        start_index = start_column * height + start_row
+        g_score[start_index] = 0
+        opened[start_index] = generation
+        heappush(heap, (0, 0, start_index))
+        while heap:
+            _, _, index = heappop(heap)
+            if index == end_index:
+                return self._walk_back(start_index, end_index)
+            if closed[index] == generation:
+                continue
+            closed[index] = generation
+            for next_index in neighbours(index, width, height):
+                cost = costs[next_index]
+                if cost == IMPASSABLE or closed[next_index] == generation \
+                        or occupied[next_index] or next_index in blocked_indexes:
+                    continue
+                score = g_score[index] + cost
+                if opened[next_index] != generation or score < g_score[next_index]:
+                    opened[next_index] = generation
+                    g_score[next_index] = score
+                    parent[next_index] = index
+                    # Every step costs at least 1, so manhattan distance
+                    # never overestimates. Ties go to whoever is closest
+                    next_column, next_row = divmod(next_index, height)
+                    remaining = abs(end_column - next_column) + abs(end_row - next_row)
+                    heappush(heap, (score + remaining, remaining, next_index))
+        return None
+
+    def _walk_back(self, start_index, end_index):
+        height, parent = self.height, self._parent
+        path = []
+        index = end_index
+        while index != start_index:
+            path.append(divmod(index, height))
+            index = parent[index]
+        path.reverse()
+        return path
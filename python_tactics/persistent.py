@@ -0,0 +1,116 @@
+"""
+    Persistent data structures, which are never changed in place
+
+    Changing one returns a new version sharing everything that didn't
+    change with the old one, so keeping every version around, to undo to
+    or to branch a search from, costs only what each change touched.
+"""
+
+from itertools import chain
+
+# Each node of a PVector holds up to 2 ** BITS children
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+class PVector:
+    """ A persistent vector: a fixed length sequence stored as a trie of
+        lists, 32 wide, indexed by successive 5 bit chunks of the index.
+
+        Reading an item walks from the root to a leaf, and `set` copies
+        just the nodes along that walk, so both take O(log32 n), which is
+        at most a handful of steps for any map there will ever be.
+    """
+
+    __slots__ = ("_root", "_shift", "_size")
+
+    def __init__(self, items=()):
+        " Builds the trie bottom up from items, in O(n) "
+        items = list(items)
+        self._size = len(items)
+        self._root, self._shift = _trie([items[start:start + WIDTH]
+                                         for start in range(0, len(items), WIDTH)])
+
+    @classmethod
+    def filled(cls, value, size):
+        " A PVector of size items all equal to value, whose full leaves are one shared list "
+        leaves = [[value] * WIDTH] * (size // WIDTH)
+        if size % WIDTH:
+            leaves.append([value] * (size % WIDTH))
+        return cls._from_trie(*_trie(leaves), size)
+
+    @classmethod
+    def _from_trie(cls, root, shift, size):
+        vector = cls.__new__(cls)
+        vector._root, vector._shift, vector._size = root, shift, size
+        return vector
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PVector index out of range")
+        node, shift = self._root, self._shift
+        while shift:
+            node = node[index >> shift & MASK]
+            shift -= BITS
+        return node[index & MASK]
+
+    def __iter__(self):
+        nodes, shift = self._root, self._shift
+        while shift:
+            nodes = chain.from_iterable(nodes)
+            shift -= BITS
+        return iter(nodes)
+
+    def __repr__(self):
+        return f"PVector({list(self)!r})"
+
+    def set(self, index, value):
+        " A new PVector with the item at index replaced by value "
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PVector index out of range")
+        return PVector._from_trie(_set(self._root, self._shift, index, value),
+                                  self._shift, self._size)
+
+    def append(self, value):
+        " A new PVector with value added to the end "
+        size, shift, root = self._size, self._shift, self._root
+        if size == WIDTH << shift:
+            # Full, so the old root becomes the first child of a new one
+            root, shift = [root], shift + BITS
+        return PVector._from_trie(_append(root, shift, size, value), shift, size + 1)
+
+def _set(node, shift, index, value):
+    node = node[:]
+    if shift:
+        slot = index >> shift & MASK
+        node[slot] = _set(node[slot], shift - BITS, index, value)
+    else:
+        node[index & MASK] = value
+    return node
+
+def _append(node, shift, index, value):
+    node = node[:]
+    if not shift:
+        node.append(value)
+        return node
+    slot = index >> shift & MASK
+    if slot == len(node):
+        node.append(_append([], shift - BITS, index, value))
+    else:
+        node[slot] = _append(node[slot], shift - BITS, index, value)
+    return node
+
+def _trie(leaves):
+    " The root and shift of a trie with leaves, which are full but for the last "
+    nodes, shift = leaves or [[]], 0
+    while len(nodes) > 1:
+        nodes = [nodes[start:start + WIDTH] for start in range(0, len(nodes), WIDTH)]
+        shift += BITS
+    return nodes[0], shift
@@ -0,0 +1,91 @@
+"""
+    Loads the next scene's assets in the background while this one is shown
+"""
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+from pyglet import clock
+
+from python_tactics.assets import assets
+
+
+class Preloader:
+    """ Loads asset groups across several frames, without stalling any.
+
+        Anything which doesn't need the GL context runs on a pool of
+        worker threads: each asset's prepare, which decodes its files, and
+        jobs, which build other data the next scene wants, like its map.
+        Once an asset is prepared, `step` loads it on the main thread,
+        where its textures are uploaded, spending at most `budget` seconds
+        a frame. `start` schedules `step` on the clock until it is done.
+    """
+
+    def __init__(self, registry=None, workers=2, budget=0.004):
+        self.registry = registry if registry is not None else assets
+        self.workers = workers
+        self.budget = budget
+        self._pool = None
+        self._prepared = {}
+        self._pending = []
+        self._jobs = {}
+        self._total = 0
+
+    def start(self, groups, jobs=None):
+        """ groups: names of the asset groups to load
+            jobs: {name: callable} run on the worker threads, whose results
+                are collected with `take`. A job already running, or done
+                but not yet taken, isn't started again
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="preload")
+        for group in groups:
+            for name in self.registry.group(group):
+                if self.registry.is_loaded(name) or name in self._pending:
+                    continue
+                prepare = self.registry.preparation(name)
+                if prepare is not None:
+                    self._prepared[name] = self._pool.submit(prepare)
+                self._pending.append(name)
+        for name, job in (jobs or {}).items():
+            if name not in self._jobs:
+                self._jobs[name] = self._pool.submit(job)
+        self._total = len(self._pending) + len(self._jobs)
+        clock.unschedule(self.step)
+        clock.schedule(self.step)
+
+    @property
+    def progress(self):
+        " How much of what was started is done, from 0 to 1 "
+        if not self._total:
+            return 1.0
+        jobs_done = sum(1 for job in self._jobs.values() if job.done())
+        return (self._total - len(self._pending) - len(self._jobs) + jobs_done) / self._total
+
+    @property
+    def done(self):
+        return not self._pending and all(job.done() for job in self._jobs.values())
+
+    def step(self, _dt=None):
+        " Load prepared assets until the frame's budget is spent "
+        started = timer()
+        for name in list(self._pending):
+            preparing = self._prepared.get(name)
+            if preparing is not None and not preparing.done():
+                continue
+            self._prepared.pop(name, None)
+            self._pending.remove(name)
+            self.registry.get(name)
+            if timer() - started > self.budget:
+                break
+        if not self._pending:
+            clock.unschedule(self.step)
+
+    def take(self, name, fallback):
+        """ The result of the job called name, waiting for it if it is still
+            running, or fallback() if no such job was started
+        """
+        job = self._jobs.pop(name, None)
+        if job is None:
+            return fallback()
+        self._total -= 1
+        return job.result()
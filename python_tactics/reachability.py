@@ -0,0 +1,93 @@
+"""
+    Works out which cells of a Map a character can walk to or reach
+"""
+from heapq import heappop, heappush
+
+from python_tactics.pathfinding import IMPASSABLE, neighbours
+from python_tactics.zobrist import mix
+
+
+def cells_within(center, distance, width, height):
+    """ Returns the set of cells at most `distance` steps away from center,
+        ignoring terrain and occupants. Cells off the map are left out
+    """
+    column, row = center
+    cells = set()
+    for d_column in range(-distance, distance + 1):
+        next_column = column + d_column
+        if not 0 <= next_column < width:
+            continue
+        spread = distance - abs(d_column)
+        for next_row in range(max(0, row - spread), min(height, row + spread + 1)):
+            cells.add((next_column, next_row))
+    return cells
+
+class Reachability:
+    """ Answers which empty cells a character could finish moving on.
+
+        Results are cached per character, starting cell and occupied
+        cells, so reselecting a character which hasn't moved, while
+        nobody else has moved either, costs a dictionary lookup.
+
+        Given a TranspositionTable, results are remembered in it instead,
+        by the occupancy's hash, starting cell and speed. Anything sharing
+        the table, like copies of a GameState, then shares the results
+        for every arrangement of units it has seen, not just the latest.
+    """
+
+    def __init__(self, width, height, costs, occupancy, table=None):
+        """ costs: flat sequence of movement costs, as taken by PathFinder
+            occupancy: object with a flat `cells` sequence where anything
+                       truthy is taken, which is replaced rather than
+                       changed, and a `flat` sequence saying the same,
+                       which is quick to read. Its `hash` is needed too
+                       when there's a table
+            table: TranspositionTable to remember results in
+        """
+        self.width, self.height = width, height
+        self.costs = costs
+        self.occupancy = occupancy
+        self.table = table
+        self._cache = {}
+        self._cached_cells = None
+
+    def reachable(self, character, start, speed):
+        " Returns a frozenset of the cells character can move to from start "
+        if self.table is not None:
+            key = self.occupancy.hash ^ mix((start[0] * self.height + start[1]) << 16 | speed)
+            cells = self.table.get(key)
+            if cells is None:
+                cells = self._flood(start, speed)
+                self.table.put(key, cells, speed)
+            return cells
+        occupied = self.occupancy.cells
+        if occupied is not self._cached_cells:
+            self._cache.clear()
+            self._cached_cells = occupied
+        key = id(character), start, speed
+        cells = self._cache.get(key)
+        if cells is None:
+            cells = self._cache[key] = self._flood(start, speed)
+        return cells
+
+    def _flood(self, start, speed):
+        " Bounded Dijkstra from start, which can't pass through occupied cells "
+        width, height = self.width, self.height
+        costs, occupied = self.costs, self.occupancy.flat
+        start_column, start_row = start
+        best = {start_column * height + start_row: 0}
+        frontier = [(0, start_column * height + start_row)]
+        while frontier:
+            spent, index = heappop(frontier)
+            if spent > best[index]:
+                continue
+            for next_index in neighbours(index, width, height):
+                cost = costs[next_index]
+                if cost == IMPASSABLE or occupied[next_index]:
+                    continue
+                total = spent + cost
+                if total <= speed and total < best.get(next_index, total + 1):
+                    best[next_index] = total
+                    heappush(frontier, (total, next_index))
+        del best[start_column * height + start_row]
+        return frozenset(divmod(index, height) for index in best)
@@ -0,0 +1,186 @@
+"""
+    Records matches as compact binary action logs, and plays them back
+
+        python -m python_tactics.replay replays/20260101-120000.replay
+        python -m python_tactics.replay replays/20260101-120000.replay --watch --speed 4
+
+    A match's dice all come from one random.Random seeded when it starts,
+    so the seed and its starting position are enough to replay every
+    attack. The log is the seed, the map's movement costs, then one fixed
+    size record per action. Every action ends a turn, so the records are
+    the turn changes too. Played back without a window, logs run as
+    quickly as the rules can, for reproducing bugs and as corpora to
+    measure changes against. Played back with --watch, GameScene shows
+    them at a faster clock.
+"""
+import argparse
+import random
+import struct
+import sys
+from timeit import default_timer as timer
+
+from python_tactics.game_state import ATTACK, END_TURN, MOVE, STATS, Action, GameState
+
+MAGIC = b"PTAL"
+VERSION = 1
+
+# magic, version, width, height, team size, team count, seed
+_HEADER = struct.Struct("<4sHHHHBQ")
+# kind, unit column and row, target column and row, damage done
+_RECORD = struct.Struct("<BHHHHH")
+
+class ReplayError(ValueError):
+    " A log which can't be read, or which its match doesn't agree with "
+
+class ActionLog:
+    """ The actions taken in a match, packed into a bytearray as they
+        happen. Attacks record the damage they did, so a replay can tell
+        when its dice have gone differently.
+    """
+
+    __slots__ = ("width", "height", "team_size", "team_count", "seed", "costs", "_records")
+
+    def __init__(self, width, height, team_size, team_count, seed, costs=None, records=b""):
+        """ costs: flat column major movement costs of the map, all 1 if None
+            records: packed records to start with, as read from a file
+        """
+        self.width, self.height = width, height
+        self.team_size, self.team_count = team_size, team_count
+        self.seed = seed
+        self.costs = bytes(costs) if costs is not None else b"\x01" * (width * height)
+        self._records = bytearray(records)
+
+    def __len__(self):
+        return len(self._records) // _RECORD.size
+
+    def __iter__(self):
+        " Each Action taken and the damage it did "
+        for kind, unit_i, unit_j, target_i, target_j, hit in _RECORD.iter_unpack(self._records):
+            if kind == END_TURN:
+                yield Action(END_TURN, None, None), hit
+            else:
+                yield Action(kind, (unit_i, unit_j), (target_i, target_j)), hit
+
+    def record(self, action, hit=0, turn=None):
+        """ hit: damage done by an attack
+            turn: how many actions were taken before this one. Any logged
+                  after them are dropped, as when a match is undone and
+                  played differently
+        """
+        if turn is not None:
+            self.truncate(turn)
+        unit_i, unit_j = action.unit or (0, 0)
+        target_i, target_j = action.target or (0, 0)
+        self._records += _RECORD.pack(action.kind, unit_i, unit_j, target_i, target_j, hit)
+
+    def truncate(self, turns):
+        " Drop every action logged after the first turns, as when they've been undone "
+        del self._records[turns * _RECORD.size:]
+
+    def new_match(self, stats=STATS, **kwargs):
+        " The match as it started, rolling the same dice. Records nothing "
+        return GameState.new_match(self.width, self.height, self.team_size, self.team_count,
+                                   costs=bytearray(self.costs), stats=stats,
+                                   rng=random.Random(self.seed), **kwargs)
+
+    def to_bytes(self):
+        header = _HEADER.pack(MAGIC, VERSION, self.width, self.height,
+                              self.team_size, self.team_count, self.seed)
+        return header + self.costs + self._records
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < _HEADER.size:
+            raise ReplayError("Log is too short to have a header")
+        magic, version, width, height, team_size, team_count, seed = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError("Not an action log")
+        if version != VERSION:
+            raise ReplayError(f"Can't read version {version} action logs, only {VERSION}")
+        records = _HEADER.size + width * height
+        if len(data) < records or (len(data) - records) % _RECORD.size:
+            raise ReplayError("Log is truncated")
+        return cls(width, height, team_size, team_count, seed,
+                   data[_HEADER.size:records], data[records:])
+
+    def save(self, path):
+        with open(path, "wb") as log_file:
+            log_file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as log_file:
+            return cls.from_bytes(log_file.read())
+
+def start_match(width, height, team_size=2, team_count=2, costs=None, seed=None, **kwargs):
+    """ A new match whose dice are seeded with seed, or a random seed, and
+        which records its actions in a new ActionLog, as its `log`
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    log = ActionLog(width, height, team_size, team_count, seed, costs)
+    return log.new_match(log=log, **kwargs)
+
+def apply_logged(state, action, hit):
+    """ Take a logged action in state, returning what GameState.apply does.
+        Raises ReplayError if it can't be taken or does different damage
+    """
+    if action.kind not in (MOVE, ATTACK, END_TURN):
+        raise ReplayError(f"Turn {state.turn}: no kind of action {action.kind}")
+    if action.kind != END_TURN:
+        for column, row in (action.unit, action.target):
+            if not (0 <= column < state.width and 0 <= row < state.height):
+                raise ReplayError(f"Turn {state.turn}: {action} is off the map")
+    result = state.apply(action)
+    if result is None:
+        raise ReplayError(f"Turn {state.turn}: {action} can't be taken")
+    if action.kind == ATTACK and result != hit:
+        raise ReplayError(f"Turn {state.turn - 1}: {action} hit for {result}, not {hit}")
+    return result
+
+def fast_forward(log, turns=None, stats=STATS):
+    " The state after the first turns actions of log, or all of them "
+    state = log.new_match(stats)
+    for count, (action, hit) in enumerate(log):
+        if turns is not None and count >= turns:
+            break
+        apply_logged(state, action, hit)
+    return state
+
+def watch(log, speed=4.0):
+    " Open a window and play log back in GameScene, speed times faster than it was played "
+    #pylint: disable=import-outside-toplevel
+    from python_tactics.scenes import GameScene
+    from python_tactics.start import start
+    start(GameScene, replay=log, speed=speed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("log", help="action log to play back")
+    parser.add_argument("--turns", type=int, default=None, help="stop after this many turns")
+    parser.add_argument("--watch", action="store_true", help="play it back in a window")
+    parser.add_argument("--speed", type=float, default=4.0, help="how much faster to watch it")
+    options = parser.parse_args(argv)
+    try:
+        log = ActionLog.load(options.log)
+    except (OSError, ReplayError) as error:
+        parser.error(str(error))
+
+    if options.watch:
+        watch(log, options.speed)
+        return
+    started = timer()
+    try:
+        state = fast_forward(log, options.turns)
+    except ReplayError as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    elapsed = timer() - started
+    winner = state.winner
+    print(f"turns       {state.turn}")
+    print(f"winner      {'none yet' if winner is None else f'team {winner + 1}'}")
+    print(f"units left  {len(state.units)}")
+    print(f"replayed at {state.turn / elapsed if elapsed else 0:.0f} turns/s")
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,40 @@
-import random
-from functools import reduce
+import os
+import time
 
 import pyglet
 from pyglet import clock
 from pyglet.graphics import Batch
-from pyglet.image import SolidColorImagePattern
 from pyglet.sprite import Sprite
 from pyglet.text import Label
-from pyglet.window import key
+from pyglet.window import key, mouse
 
+from python_tactics.ai import ComputerPlayer
+from python_tactics.assets import assets
 from python_tactics.characters import Beefy, Ranged
+from python_tactics.depth import DepthBatch
+from python_tactics.game_state import ATTACK, BEEFY, MOVE, RANGED
+from python_tactics.highlight import HighlightLayer
+from python_tactics.hud import Hud
 from python_tactics.map import Map
-from python_tactics.sprite import PixelAwareSprite
-from python_tactics.util import (find_path, load_sprite_asset)
+from python_tactics.motion import Motion
+from python_tactics.new_sprite import animation_clock
+from python_tactics.preloader import Preloader
+from python_tactics.replay import start_match
+from python_tactics.snapshot import SnapshotError, load_file, save_file
+from python_tactics.terrain import TerrainRenderer
+from python_tactics.util import load_sprite_asset, prefetch_images
+
+
+def centred_sprite_asset(name):
+    " Loads png files from the assets folder, anchored in the middle "
+    image = load_sprite_asset(name)
+    image.anchor_x = int(image.width / 2)
+    image.anchor_y = int(image.height / 2)
+    return image
+
+assets.register("moogle", lambda: centred_sprite_asset("moogle"), groups=("menu",))
+assets.register("tiles/grass", lambda: centred_sprite_asset("grass"), groups=("game",),
+                prepare=lambda: prefetch_images("grass"))
 
 
 class World:
@@ -21,10 +43,14 @@ class World:
         self.window = window
         self.camera = camera
         self.current = None
+        # Loads what the next scene needs while the current one is shown
+        self.preloader = Preloader()
 
     def transition(self, scenecls, *args, **kwargs):
         if self.current:
             self.current.unload(self.window)
+        for group in scenecls.PRELOAD:
+            assets.preload(group)
         scene = scenecls(self, *args, **kwargs)
         self.current = scene
         scene.load(self.window)
@@ -38,7 +64,10 @@ class World:
 class Scene:
 
     WINDOW_EVENTS = ["on_draw", "on_mouse_press", "on_mouse_release",
-                     "on_mouse_drag", "on_key_press"]
+                     "on_mouse_drag", "on_mouse_motion", "on_key_press"]
+
+    # Asset groups loaded before the scene is created
+    PRELOAD = ()
 
     def __init__(self, world):
         self.world = world
@@ -120,6 +149,8 @@ class AtlasBrowsingScene(Scene):
 
 class MainMenuScene(Scene):
 
+    PRELOAD = ("menu",)
+
     def __init__(self, world):
         super().__init__(world)
         self.text_batch = Batch()
@@ -131,8 +162,10 @@ class MainMenuScene(Scene):
         self.moogle = self._load_moogle()
 
         self.menu_items = {
-            "Start Game"   : self._new_game,
-            "About"        : self._launch_about,
+            "Start Game"      : self._new_game,
+            "Versus Computer" : self._new_computer_game,
+            "Load Game"       : self._load_game,
+            "About"           : self._launch_about,
             "Quit Program" : self.window.close
         }
         self._generate_text()
@@ -147,6 +180,8 @@ class MainMenuScene(Scene):
     def enter(self):
         black = 0, 0, 0, 0
         pyglet.gl.glClearColor(*black)
+        # Get the game ready while the menu is up, so starting is instant
+        self.world.preloader.start(GameScene.PRELOAD, jobs={"match": GameScene.generate_match})
 
     def on_draw(self):
         self.world.window.clear()
@@ -179,10 +214,7 @@ class MainMenuScene(Scene):
                 x=hint_x, y=hint_y - 20, batch=self.text_batch)
 
     def _load_moogle(self):
-        moogle_image = load_sprite_asset("moogle")
-        moogle_image.anchor_x = int(moogle_image.width / 2)
-        moogle_image.anchor_y = int(moogle_image.height / 2)
-        moog_sprite = Sprite(moogle_image,
+        moog_sprite = Sprite(assets.get("moogle"),
                         self.camera.to_x_from_left(40),
                         self.camera.to_y_from_bottom(40))
         return moog_sprite
@@ -190,6 +222,18 @@ class MainMenuScene(Scene):
     def _new_game(self):
         self.world.transition(GameScene)
 
+    def _new_computer_game(self):
+        self.world.transition(GameScene, computer_teams=(1,))
+
+    def _load_game(self):
+        try:
+            snapshot = load_file(GameScene.SAVE_FILE, GameScene.generate_map)
+        except (OSError, SnapshotError) as error:
+            print("Can't load the saved game:", error)
+            return
+        self.world.transition(GameScene, computer_teams=snapshot.computer_teams,
+                              match=(snapshot.game_map, snapshot.state))
+
     def _launch_about(self):
         self.world.transition(AboutScene, previous=self)
 
@@ -205,6 +249,8 @@ class MainMenuScene(Scene):
 #pylint: disable=too-many-instance-attributes
 class GameScene(Scene):
 
+    PRELOAD = ("game",)
+
     # Team constants
     TEAM_SIZE = 2
     TEAM_COUNT = 2
@@ -217,36 +263,68 @@ class GameScene(Scene):
     # The modes the game scene can be in
     NOTIFY, SELECT_MODE, ACTION_MODE, MOVE_TARGET_MODE, ATTACK_TARGET_MODE = list(range(5))
 
-    def __init__(self, world):
+    # What each kind of unit is drawn as
+    CHARACTERS = {BEEFY: Beefy, RANGED: Ranged}
+
+    # Seconds the computer gets to think about each turn
+    COMPUTER_BUDGET = 1.0
+
+    # Where each match's action log is saved once it's over
+    REPLAY_DIRECTORY = "replays"
+    # Seconds between the turns of a replay, at normal speed
+    REPLAY_TURN_SECONDS = 1.0
+    # Where the game is saved from the in game menu
+    SAVE_FILE = os.path.join("saves", "quicksave.snapshot")
+
+    def __init__(self, world, computer_teams=(), replay=None, speed=1.0, match=None):
+        """ computer_teams: teams played by a ComputerPlayer, the rest are
+                played from the keyboard and mouse
+            replay: ActionLog to play back instead of letting anyone play
+            speed: how many times faster than normal time passes
+            match: Map and GameState to carry on playing, instead of
+                starting a new match
+        """
         super().__init__(world)
 
-        self.map_batch  = Batch()
-        self.map        = self._generate_map()
-        self.players    = self._initialize_teams()
-        self.current_turn = 1
+        if replay is not None:
+            self.map = GameScene.generate_map(replay.width, replay.height)
+            self.state = replay.new_match()
+            self.replay = iter(replay)
+        elif match is not None:
+            self.map, self.state = match
+            self.replay = None
+        else:
+            self.map, self.state = self.world.preloader.take("match", GameScene.generate_match)
+            self.replay = None
+        self.speed = speed
+        self.computers  = {team: ComputerPlayer(team, GameScene.COMPUTER_BUDGET)
+                           for team in computer_teams}
+        self.terrain    = self._generate_terrain()
+        self.characters = DepthBatch(GameScene.GRID_HEIGHT / 2)
+        # Where every Character is walking, ticked all at once
+        self.motion     = Motion()
+        # The Character drawn for each unit, by uid
+        self.sprites    = {}
+        self._create_characters()
+        # States before each action taken, and after each one undone
+        self.history, self.future = [], []
+        # Tiles which need hilighting from different modes
+        self.highlights = HighlightLayer(self.terrain.tint)
         self.selected   = 0, 0
-        self.selected_character = None
+        self.selected_unit = None
         self.mode = GameScene.SELECT_MODE
-        self.turn_notice = None
+        self.status = Hud()
+        self.turn_notice = self.status.add_label("", 10, 10, font_name='Times New Roman', font_size=36)
 
         # Items for action menu
-        self.text_batch = Batch()
-        self.cursor_pos = 0
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=self.camera.to_x_from_left(10),
-                            y=self.camera.to_y_from_bottom(140),
-                            batch=self.text_batch)
-        self.action_menu_texts = []
-
         self.action_menu_items = {
                 "Move"              : self._initiate_movement,
                 "Attack"            : self._initiate_attack,
                 "Cancel"            : self._close_action_menu,
         }
-
-        # Sprites which need hilighting from different modes
-        self.movement_hilight = []
-        self.attack_hilight = []
+        self.action_menu = self._generate_action_menu()
+        self.cursor_pos = 0
+        self.cursor = self.action_menu.add_label(">", 10, 150, font_name='Times New Roman', font_size=36)
 
         self.key_handlers = {
             GameScene.SELECT_MODE : {
@@ -283,35 +361,128 @@ class GameScene(Scene):
         }
         self.change_player()
 
-    def _all_characters(self):
-        return reduce(lambda chars, player: player + chars, self.players)
+    @property
+    def selected(self):
+        return self.highlights.selected
 
-    def _other_characters(self):
-        if self.current_turn:
-            return self.players[0]
-        return self.players[1]
+    @selected.setter
+    def selected(self, cell):
+        self.highlights.select(cell)
 
     def change_player(self):
-        old_turn = self.current_turn
-        self.current_turn = (self.current_turn + 1) % GameScene.TEAM_COUNT
-        if not self.players[self.current_turn]:
-            self.world.transition(VictoryScene, winner=old_turn + 1)
+        " Show whose turn the state has moved on to, or who has won "
+        winner = self.state.winner
+        if winner is not None:
+            self.close()
+            self.world.transition(VictoryScene, winner=winner + 1)
         else:
             self.display_turn_notice()
             self.highlight_next_character_on_current_team()
+            if self._computers_turn():
+                self.computers[self.state.current_team].start(self.state)
+                self._schedule_poll()
+
+    def _computers_turn(self):
+        return self.state.current_team in self.computers
+
+    def _input_blocked(self):
+        " Whether the computer or a replay is playing the current turn "
+        return self.replay is not None or self._computers_turn()
+
+    def _schedule_poll(self):
+        " Poll the computer for its action each frame, once however often it's asked "
+        clock.unschedule(self._poll_computer)
+        clock.schedule_interval(self._poll_computer, 1 / 30)
+
+    def _poll_computer(self, _dt):
+        " Take the computer's action once it has finished thinking "
+        computer = self.computers[self.state.current_team]
+        action = computer.poll()
+        if action is None:
+            return
+        clock.unschedule(self._poll_computer)
+        self._take(action)
+        self.change_player()
+
+    def _replay_step(self, _dt):
+        " Take the replay's next action, stopping once it runs out "
+        logged = next(self.replay, None)
+        if logged is None:
+            clock.unschedule(self._replay_step)
+            return
+        action, _ = logged
+        self._take(action)
+        self.change_player()
+
+    def _take(self, action):
+        " Take an Action for the current team, showing it on the characters "
+        unit = self.state.unit_at(action.unit) if action.unit is not None else None
+        if action.kind == MOVE:
+            self._move(unit, action.target)
+        elif action.kind == ATTACK:
+            self._attack(unit, self.state.unit_at(action.target))
+        else:
+            self._remember(self.state.branch())
+            self.state.end_turn()
+
+    def _remember(self, before):
+        " Keep the state from before an action, to undo it "
+        self.history.append(before)
+        self.future.clear()
+
+    def undo(self):
+        " Go back to before the last action, and any the computer took since "
+        self._travel(self.history, self.future)
+
+    def redo(self):
+        " Take the last actions undone again, up to a player's turn "
+        self._travel(self.future, self.history)
+
+    def _travel(self, source, destination):
+        if self.replay is not None or not source:
+            return
+        clock.unschedule(self._poll_computer)
+        destination.append(self.state)
+        self.state = source.pop()
+        while self._computers_turn() and source:
+            destination.append(self.state)
+            self.state = source.pop()
+        self._create_characters()
+        self.highlights.clear()
+        self._close_action_menu()
+        self.change_player()
+
+    def close(self):
+        " Stop the computer players' processes and save the match's action log "
+        clock.unschedule(self._poll_computer)
+        clock.unschedule(self._replay_step)
+        for computer in self.computers.values():
+            computer.close()
+        log = self.state.log
+        if log is None:
+            return
+        # Undone actions stay logged, for redoing, until others replace them
+        log.truncate(self.state.turn)
+        if len(log):
+            os.makedirs(GameScene.REPLAY_DIRECTORY, exist_ok=True)
+            path = os.path.join(GameScene.REPLAY_DIRECTORY, time.strftime("%Y%m%d-%H%M%S.replay"))
+            log.save(path)
+            print("Saved the match's replay to", path)
+        self.state.log = None
+
+    def save(self):
+        " Save the match to SAVE_FILE, to be carried on with from the main menu "
+        os.makedirs(os.path.dirname(GameScene.SAVE_FILE), exist_ok=True)
+        save_file(GameScene.SAVE_FILE, self.state, self.map, tuple(self.computers))
+        print("Saved the game to", GameScene.SAVE_FILE)
 
     def display_turn_notice(self):
-        if self.turn_notice is not None:
-            self.turn_notice.delete()
-        self.turn_notice = Label(
-                "Player %s's Turn" % (self.current_turn + 1),
-                font_name='Times New Roman', font_size=36,
-                x=self.camera.to_x_from_left(10),
-                y=self.camera.to_y_from_bottom(10))
-        self.turn_notice.color = 255 - (100 * self.current_turn), 255 - (100 * ((self.current_turn + 1) % 2)), 255, 255
+        current_team = self.state.current_team
+        self.turn_notice.text = "Player %s's Turn" % (current_team + 1)
+        self.turn_notice.color = 255 - (100 * current_team), 255 - (100 * ((current_team + 1) % 2)), 255, 255
 
     def highlight_next_character_on_current_team(self):
-        current_team_positions = [self.map.get_row_column(c.x, c.y) for c in self.players[self.current_turn]]
+        current_team_positions = [unit.position for unit in self.state.team(self.state.current_team)]
         if self.selected in current_team_positions:
             if len(current_team_positions) == 1:
                 return
@@ -323,68 +494,54 @@ class GameScene(Scene):
         newx, newy = self.map.get_coordinates(*self.selected)
         self.camera.look_at((newx + self.camera.x) / 2, (newy + self.camera.y) / 2)
 
-    def _initialize_teams(self):
-        def create_team(team_number, positions):
-            team = []
-            for character_count, (i, j, direction) in enumerate(positions):
-                cls = Beefy if character_count % 2 == 0 else Ranged
-                char_x, char_y = self.map.get_coordinates(i, j)
-                character = cls(char_x, char_y, direction)
-                character.zindex = 10
-                character.color = 255 - (200 * team_number), 110, 255 - (200 * ((team_number + 1) % GameScene.TEAM_COUNT))
-                team.append(character)
-            return team
-        return [create_team(team_number, positions)
-                for team_number, positions
-                in enumerate(self.map.get_starting_positions(GameScene.TEAM_SIZE)[0:GameScene.TEAM_COUNT])]
+    def _create_characters(self):
+        " Draw a Character for every unit, replacing any already drawn "
+        for character in self.sprites.values():
+            self.characters.remove(character)
+            character.delete()
+        self.sprites = {unit.uid: self._create_character(unit) for unit in self.state.units}
+
+    def _create_character(self, unit):
+        char_x, char_y = self.map.get_coordinates(unit.i, unit.j)
+        character = GameScene.CHARACTERS[unit.kind](char_x, char_y, unit.facing,
+                                                    batch=self.characters.batch,
+                                                    overlay_group=self.characters.overlay_group,
+                                                    health=unit.health, motion=self.motion)
+        self.characters.place(character)
+        character.zindex = 10
+        character.color = 255 - (200 * unit.team), 110, 255 - (200 * ((unit.team + 1) % GameScene.TEAM_COUNT))
+        return character
 
     def move_hilight(self, x, y):
         current_x, current_y = self.selected
-        self.selected = max(0, min(x + current_x, GameScene.MAP_WIDTH - 1)),\
-                        max(0, min(y + current_y, GameScene.MAP_HEIGHT - 1))
+        self.selected = max(0, min(x + current_x, self.map.width - 1)),\
+                        max(0, min(y + current_y, self.map.height - 1))
         newx, newy = self.map.get_coordinates(*self.selected)
         self.camera.look_at((newx + self.camera.x) / 2, (newy + self.camera.y) / 2)
 
     def enter(self):
         blue = 0.6, 0.6, 1, 0.8
         pyglet.gl.glClearColor(*blue)
+        animation_clock.speed = self.speed
         clock.schedule(self._update_characters)
+        if self.replay is not None:
+            clock.schedule_interval(self._replay_step, GameScene.REPLAY_TURN_SECONDS / self.speed)
+        elif self._computers_turn():
+            self._schedule_poll()
 
     def exit(self):
+        animation_clock.speed = 1.0
         clock.unschedule(self._update_characters)
+        clock.unschedule(self._poll_computer)
+        clock.unschedule(self._replay_step)
 
     def on_draw(self):
         self.window.clear()
-        selected_x, selected_y = self.map.get_coordinates(*self.selected)
-#        if  selected_x <= 100 or selected_x >= 500 \
-#                or selected_y <= 100 or selected_y >= 700:
-        for sprite in self.map.sprites:
-            if (selected_x, selected_y) == (sprite.x, sprite.y):
-                sprite.color = 100, 100, 100
-            elif sprite in self.movement_hilight:
-                sprite.color = 100, 100, 255
-            elif sprite in self.attack_hilight:
-                sprite.color = 255, 100, 100
-            else:
-                sprite.color = 255, 255, 255
-        self.map_batch.draw()
-        if hasattr(self, 'turn_notice'):
-            self.turn_notice.x = self.camera.to_x_from_left(10)
-            self.turn_notice.y = self.camera.to_y_from_bottom(10)
-            self.turn_notice.draw()
-        characters_in_y_order = sorted(self._all_characters(), key=lambda c: -int(c.y))
-        for character in characters_in_y_order:
-#            if (selected_x, selected_y) == (character.x, character.y):
-#                character.color = 100, 100, 100
-#            else:
-#                character.color = 255, 255, 255
-            character.draw_character()
-#            #character.image.blit(character.x, character.y)
-        for character in characters_in_y_order:
-            character.draw_ui()
+        self.terrain.draw(self.camera.view_bounds(self.window.width, self.window.height))
+        self.status.draw(self.camera)
+        self.characters.draw()
         if self.mode == GameScene.ACTION_MODE:
-            self._draw_action_menu()
-            self.text_batch.draw()
+            self.action_menu.draw(self.camera)
         self.camera.focus(self.window.width, self.window.height)
         self.camera.draw()
 
@@ -394,199 +551,161 @@ class GameScene(Scene):
 
     def _move_cursor(self, direction):
         self.cursor_pos = (self.cursor_pos - direction) % len(self.action_menu_items)
-        self.cursor.y = self.camera.to_y_from_bottom(150 - 50 * self.cursor_pos)
+        self.action_menu.move(self.cursor, 10, 150 - 50 * self.cursor_pos)
 
-    def _draw_action_menu(self):
-        pattern = SolidColorImagePattern((0, 0, 150, 200))
-        overlay_image = pattern.create_image(1000, 200)
-        overlay_image.anchor_x = int(overlay_image.width / 2)
-        overlay_image.anchor_y = overlay_image.height + 100
-        overlay = Sprite(overlay_image, self.camera.x, self.camera.y)
-        overlay.draw()
-
-        self._generate_text()
-
-    def _generate_text(self):
+    def _generate_action_menu(self):
+        menu = Hud()
+        menu.add_overlay((0, 0, 150, 200), 1000, 200, 400, 100)
         menu_texts = reversed(list(self.action_menu_items.keys()))
-        for label in self.action_menu_texts:
-            label.delete()
-
         for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(40, 150 - 50 * i)
-            self.action_menu_texts.append(
-                    Label(text, font_name='Times New Roman', font_size=36,
-                        x=text_x, y=text_y, batch=self.text_batch))
-
-
-#    def on_mouse_press(self, x, y, button, modifiers):
-#        real_x, real_y = int(self.camera.offset_x + x),\
-#                         int(self.camera.offset_y + y)
-#        inside_map = self.map.find_sprite(x, y)
-#        inside_chars = [c for c in self.characters if c.contains(real_x, real_y)]
-#        taken  = [self.map.get_row_column(c.x, c.y) for c in self.characters]
-#
-#        # Reset everything
-#        if self.selected: self.selected.color = 255, 255, 255
-#        for msprite in self.map.sprites:
-#            msprite.color = 255, 255, 255
-#
-#        if inside_chars or inside_map:
-#            if inside_chars:
-#                selected = inside_chars[0]
-#            else:
-#                selected = inside_map
-#            last, self.selected = self.selected, selected
-#            self.selected.color = 100, 100, 100
-#            rx = self.selected.x + self.camera.offset_x
-#            ry = self.selected.y + self.camera.offset_y
-#            column, row = self.map.get_row_column(selected.x, selected.y)
-#            if hasattr(self.selected, "is_player"):
-#                in_range = self._points_in_range(column, row, 4)
-#                for column, row in in_range:
-#                    if (column, row) not in taken:
-#                        self.map.get_sprite(column, row).color = 100, 100, 255
-#            elif hasattr(last, "is_player"):
-#                last_column, last_row = self.map.get_row_column(last.x, last.y)
-#                last_pair = last_column, last_row
-#                new_indexes = self.map.get_row_column(selected.x, selected.y)
-#                new_pair  = int(selected.x), int(selected.y)
-#                in_range = self._points_in_range(last_column, last_row, 4)
-#                if new_indexes in in_range and new_pair not in taken:
-#                    self._schedule_movement(last, new_pair)
-#        else:
-#            self.selected = None
+            menu.add_label(text, 40, 150 - 50 * i, font_name='Times New Roman', font_size=36)
+        return menu
+
+
+    def pick(self, x, y):
+        """ Returns the column, row of the tile under window pixel x, y and
+            the unit standing there, if any. A unit is picked wherever its
+            character shows, even over the tiles behind it, with those in
+            front first. Off the map gives None, None
+        """
+        world_x, world_y = self.camera.to_world(x, y, self.window.width, self.window.height)
+        # Further down the screen is further forward
+        under = [(character.y, uid) for uid, character in self.sprites.items()
+                 if character.contains(world_x, world_y)]
+        if under:
+            unit = self.state.registry.get(min(under)[1])
+            if unit is not None:
+                return unit.position, unit
+        cell = self.map.tile_at(world_x, world_y)
+        if cell is None:
+            return None, None
+        return cell, self.state.unit_at(cell)
+
+    def on_mouse_motion(self, x, y, _dx, _dy):
+        cell, _ = self.pick(x, y)
+        self.highlights.hover(cell)
+
+    def on_mouse_press(self, x, y, button, _modifiers):
+        if button != mouse.LEFT or self.mode == GameScene.ACTION_MODE or self._input_blocked():
+            return
+        cell, unit = self.pick(x, y)
+        if cell is None:
+            return
+        self.selected = cell
+        if self.mode == GameScene.SELECT_MODE:
+            if unit is not None and unit.team == self.state.current_team:
+                self._open_action_menu()
+        elif self.mode == GameScene.MOVE_TARGET_MODE:
+            self._execute_move()
+        elif self.mode == GameScene.ATTACK_TARGET_MODE:
+            self._execute_attack()
 
     def _initiate_movement(self):
         self.mode = GameScene.MOVE_TARGET_MODE
-        self.movement_hilight = []
-        character = self.selected_character
-        taken  = [self.map.get_row_column(c.x, c.y) for c in self._all_characters()]
-        column, row = self.map.get_row_column(character.x, character.y)
-        in_range = self._points_in_range(column, row, character.speed)
-        for column, row in in_range:
-            if (column, row) not in taken:
-                self.movement_hilight.append(self.map.get_sprite(column, row))
+        self.highlights.show_movement(self.state.reachable(self.selected_unit))
 
     def _execute_move(self):
-        taken  = [self.map.get_row_column(c.x, c.y) for c in self._all_characters()]
-        if self.selected not in taken:
-            sprite = self.map.get_sprite(*self.selected)
-            if sprite in self.movement_hilight:
-                last = self.map.get_coordinates(*self.selected)
-                self._schedule_movement(self.selected_character, last)
-                self.movement_hilight = []
+        if self.selected in self.highlights.movement:
+            if self._move(self.selected_unit, self.selected):
+                self.highlights.show_movement(())
                 self.change_player()
                 self._close_action_menu()
 
+    def _move(self, unit, cell):
+        " Move unit in the state, and walk its character along the path "
+        before = self.state.branch()
+        path = self.state.move(unit, cell)
+        if path:
+            self._remember(before)
+            self._schedule_movement(self.sprites[unit.uid], path)
+        return bool(path)
+
     def _initiate_attack(self):
         self.mode = GameScene.ATTACK_TARGET_MODE
-        self.attack_hilight = []
-        character = self.selected_character
-        column, row = self.map.get_row_column(character.x, character.y)
-        in_range = self._points_in_range(column, row, character.range)
-        in_range.remove(self.selected)
-        for column, row in in_range:
-            self.attack_hilight.append(self.map.get_sprite(column, row))
+        self.highlights.show_attack(self.state.in_range(self.selected_unit))
 
     def _execute_attack(self):
-        sprite = self.map.get_sprite(*self.selected)
-        attacker = self.selected_character
-        attacked = None
-        if sprite in self.attack_hilight:
-            for character in self._other_characters():
-                char_loc = self.map.get_row_column(character.x, character.y)
-                if  char_loc == self.selected:
-                    attacked = character
-        if attacked:
-            attack = random.randrange(attacker.strength)
-            defense = random.randrange(attacked.defense)
-            hit = max(1, defense - attack)
-            print("Hit for ", hit)
-            attacker.attack_sound.play()
-            remaining_health = attacked.hit(hit)
-            if remaining_health == 0:
-                self._other_characters().remove(attacked)
-                attacked.delete()
-            self.attack_hilight = []
+        if self.selected not in self.highlights.attack:
+            return
+        attacked = self.state.unit_at(self.selected)
+        if attacked is not None and self._attack(self.selected_unit, attacked):
+            self.highlights.show_attack(())
             self.change_player()
             self._close_action_menu()
 
+    def _attack(self, attacker, attacked):
+        " Attack in the state, and show the hit on the characters "
+        before = self.state.branch()
+        hit = self.state.attack(attacker, attacked)
+        if hit is None:
+            return False
+        self._remember(before)
+        print("Hit for ", hit)
+        self.sprites[attacker.uid].attack_sound.play()
+        self.sprites[attacked.uid].hit(hit)
+        if self.state.current(attacked) is None:
+            character = self.sprites.pop(attacked.uid)
+            self.characters.remove(character)
+            character.delete()
+        return True
+
     def on_key_press(self, button, modifiers):
         pressed = (button, modifiers)
+        if self._input_blocked():
+            # Only the menu, while the computer is thinking or a replay plays
+            if pressed == (key.ESCAPE, 0):
+                self.game_menu()
+            return
         handler = self.key_handlers[self.mode].get(pressed, lambda: None)
         handler()
 
-    def _generate_map(self):
-        x, y = GameScene.MAP_START_X, GameScene.MAP_START_Y
-        x_offset, y_offset = self.GRID_WIDTH / 2, self.GRID_HEIGHT / 2
-        columns, rows = GameScene.MAP_WIDTH, GameScene.MAP_HEIGHT
-
-        column_starts = [(x + i * x_offset, y - i * y_offset)
-                            for i in range(columns)]
-        map_points    = [[(x - i * x_offset, y - i * y_offset)
-                            for i in range(rows)]
-                            for x, y in column_starts]
-
-        gamemap = Map(columns, rows)
-        image = load_sprite_asset("grass")
-        image.anchor_x = int(image.width / 2)
-        image.anchor_y = int(image.height / 2)
-        for i, column in enumerate(map_points):
-            for j, (x, y) in enumerate(column):
-                sprite = PixelAwareSprite(image, x, y,
-                            batch=self.map_batch, centery=True)
-                sprite.scale = 1
-                sprite.zindex = 0
-                gamemap.add_sprite(i, j, sprite)
-                # Uncomment to display grid numbers
-                # very useful to understand space
-                # Label(f"{i}, {j}",
-                #       font_name='Times New Roman',
-                #       font_size=12,
-                #       x=x,
-                #       y=y,
-                #       batch=self.map_batch)
-        return gamemap
-
-    def _points_in_range(self, column, row, length):
-        if not 0 <= column < self.MAP_HEIGHT:
-            return []
-        if length == 0:
-            return [(column, row)]
-        return self._points_in_range(column - 1, row, length - 1) +\
-                [(column, min(max(0, row - length + i), self.MAP_WIDTH - 1))
-                    for i in range(2 * length + 1)] + \
-                self._points_in_range(column + 1, row, length - 1)
-
-    def _schedule_movement(self, sprite, pos):
-        end_x, end_y = pos
-        path = find_path(self.map.coordinates, sprite.x, sprite.y, end_x, end_y)
-        for x, y in path:
+    @staticmethod
+    def generate_map(width=MAP_WIDTH, height=MAP_HEIGHT):
+        return Map(width, height,
+                   origin=(GameScene.MAP_START_X, GameScene.MAP_START_Y),
+                   tile_size=(GameScene.GRID_WIDTH, GameScene.GRID_HEIGHT))
+
+    @staticmethod
+    def generate_match():
+        """ A new map, and a match on it with both teams in their starting
+            positions, its own seeded dice and a log of its actions
+        """
+        game_map = GameScene.generate_map()
+        state = start_match(game_map.width, game_map.height, GameScene.TEAM_SIZE,
+                            GameScene.TEAM_COUNT, costs=game_map.costs)
+        return game_map, state
+
+    def _generate_terrain(self):
+        return TerrainRenderer(self.map, assets.get("tiles/grass"))
+
+    def _schedule_movement(self, sprite, path):
+        for column, row in path:
+            x, y = self.map.get_coordinates(column, row)
             sprite.move_to(x, y, 0.3)
 
     def _update_characters(self, delta):
-        for character in self._all_characters():
-            character.tick(delta)
+        # Only characters which walked need their sprites and depths updating
+        moved = self.motion.tick(delta * self.speed)
+        for character in moved:
+            character.follow()
+        self.characters.update(moved)
 
     def _close_action_menu(self):
-        self.selected_character = None
+        self.selected_unit = None
         self.mode = GameScene.SELECT_MODE
 
     def _open_action_menu(self):
-        if not self.selected_character:
-            selected_x, selected_y = self.map.get_coordinates(*self.selected)
-            for character in self.players[self.current_turn]:
-                if (character.x, character.y) == (selected_x, selected_y):
-                    self.selected_character = character
-        if self.selected_character:
-            self.movement_hilight = []
-            self.attack_hilight = []
+        if not self.selected_unit:
+            unit = self.state.unit_at(self.selected)
+            if unit is not None and unit.team == self.state.current_team:
+                self.selected_unit = unit
+        if self.selected_unit:
+            self.highlights.clear()
             self.camera.stop()
             self.cursor_pos = 0
-            self.cursor.x = self.camera.to_x_from_left(10)
-            self.cursor.y = self.camera.to_y_from_bottom(150)
+            self.action_menu.move(self.cursor, 10, 150)
             self.mode = GameScene.ACTION_MODE
-            self.selected = self.map.get_row_column(self.selected_character.x, self.selected_character.y)
+            self.selected = self.selected_unit.position
 
     def game_menu(self):
         self.camera.stop()
@@ -598,11 +717,9 @@ class VictoryScene(Scene):
     def __init__(self, world, winner):
         super().__init__(world)
         self.winner = winner
-        self.text_batch = Batch()
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=280 + self.camera.offset_x,
-                            y=200 + self.camera.offset_y,
-                            batch=self.text_batch)
+        self.hud = Hud()
+        self.hud.add_overlay((0, 0, 100, 200), 1000, 1000, 400, 300)
+        self.cursor = self.hud.add_label(">", 280, 200, font_name='Times New Roman', font_size=36)
         self.cursor_pos = 0
 
         self.menu_items = {
@@ -619,38 +736,24 @@ class VictoryScene(Scene):
     def on_draw(self):
         self.window.clear()
         # Display the previous scene, then tint it
-        self.text_batch.draw()
+        self.hud.draw(self.camera)
 
     def on_key_press(self, button, modifiers):
         pressed = (button, modifiers)
         handler = self.key_handlers.get(pressed, lambda: None)
         handler()
 
-    def _draw_overlay(self):
-        pattern = SolidColorImagePattern((0, 0, 100, 200))
-        overlay_image = pattern.create_image(1000, 1000)
-        overlay_image.anchor_x = int(overlay_image.width / 2)
-        overlay_image.anchor_y = int(overlay_image.height / 2)
-        overlay = Sprite(overlay_image, self.camera.x, self.camera.y)
-        overlay.draw()
-
     def _generate_text(self):
         menu_texts = reversed(list(self.menu_items.keys()))
         for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(300, 200 - 40 * i)
-            Label(text, font_name='Times New Roman', font_size=36,
-                    x=text_x, y=text_y, batch=self.text_batch)
+            self.hud.add_label(text, 300, 200 - 40 * i, font_name='Times New Roman', font_size=36)
 
-        hint_x, hint_y = self.camera.to_xy_from_bottom_left(400, 30)
-        Label("Use Up and Down Arrows to navigate",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y, batch=self.text_batch)
-        Label("Use Enter to choose",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y - 20, batch=self.text_batch)
-        Label("Player %s Won!" % self.winner,
-                font_name='Times New Roman', font_size=48,
-                x=hint_x - 150, y=hint_y + 370, batch=self.text_batch)
+        self.hud.add_label("Use Up and Down Arrows to navigate", 400, 30,
+                           font_name='Times New Roman', font_size=18)
+        self.hud.add_label("Use Enter to choose", 400, 10,
+                           font_name='Times New Roman', font_size=18)
+        self.hud.add_label("Player %s Won!" % self.winner, 250, 400,
+                           font_name='Times New Roman', font_size=48)
 
     def _menu_action(self):
         actions = list(reversed(list(self.menu_items.values())))
@@ -658,7 +761,7 @@ class VictoryScene(Scene):
 
     def _move_cursor(self, direction):
         self.cursor_pos = (self.cursor_pos - direction) % len(self.menu_items)
-        self.cursor.y = 500 + self.camera.offset_y - 40 * self.cursor_pos
+        self.hud.move(self.cursor, 280, 200 - 40 * self.cursor_pos)
 
     def _main_menu(self):
         self.world.transition(MainMenuScene)
@@ -667,16 +770,18 @@ class InGameMenuScene(Scene):
 
     def __init__(self, world, previous):
         super().__init__(world)
-        self.text_batch = Batch()
+        self.hud = Hud()
         self.old_scene = previous
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=self.camera.to_x_from_left(360),
-                            y=self.camera.to_y_from_bottom(500),
-                            batch=self.text_batch)
+        self.hud.add_overlay((0, 0, 0, 200), self.window.width + 200, self.window.height + 200,
+                             self.window.width / 2, self.window.height / 2)
+        self.cursor = self.hud.add_label(">", 360, 500, font_name='Times New Roman', font_size=36)
         self.cursor_pos = 0
 
         self.menu_items = {
             "Resume"            : self._resume_game,
+            "Undo"              : self._undo,
+            "Redo"              : self._redo,
+            "Save Game"         : self._save_game,
             "Help"              : self._launch_help,
             "Quit Current Game" : self._quit_game
         }
@@ -693,40 +798,24 @@ class InGameMenuScene(Scene):
         self.window.clear()
         # Display the previous scene, then tint it
         self.old_scene.on_draw()
-        self._draw_overlay()
-        self.text_batch.draw()
+        self.hud.draw(self.camera)
 
     def on_key_press(self, button, modifiers):
         pressed = (button, modifiers)
         handler = self.key_handlers.get(pressed, lambda: None)
         handler()
 
-    def _draw_overlay(self):
-        pattern = SolidColorImagePattern((0, 0, 0, 200))
-        overlay_image = pattern.create_image(self.world.window.width + 200, self.world.window.height + 200)
-        overlay_image.anchor_x = int(overlay_image.width / 2)
-        overlay_image.anchor_y = int(overlay_image.height / 2)
-        overlay = Sprite(overlay_image, self.camera.x, self.camera.y)
-        overlay.draw()
-
     def _generate_text(self):
-        pause_x, pause_y = self.camera.to_xy_from_bottom_left(10, 10)
-        Label('Paused', font_name='Times New Roman', font_size=56,
-                x=pause_x, y=pause_y, batch=self.text_batch)
+        self.hud.add_label('Paused', 10, 10, font_name='Times New Roman', font_size=56)
 
         menu_texts = reversed(list(self.menu_items.keys()))
         for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(400, 500 - 40 * i)
-            Label(text, font_name='Times New Roman', font_size=36,
-                    x=text_x, y=text_y, batch=self.text_batch)
+            self.hud.add_label(text, 400, 500 - 40 * i, font_name='Times New Roman', font_size=36)
 
-        hint_x, hint_y = self.camera.to_xy_from_bottom_left(400, 30)
-        Label("Use Up and Down Arrows to navigate",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y, batch=self.text_batch)
-        Label("Use Enter to choose",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y - 20, batch=self.text_batch)
+        self.hud.add_label("Use Up and Down Arrows to navigate", 400, 30,
+                           font_name='Times New Roman', font_size=18)
+        self.hud.add_label("Use Enter to choose", 400, 10,
+                           font_name='Times New Roman', font_size=18)
 
     def _menu_action(self):
         actions = list(reversed(list(self.menu_items.values())))
@@ -734,15 +823,28 @@ class InGameMenuScene(Scene):
 
     def _move_cursor(self, direction):
         self.cursor_pos = (self.cursor_pos - direction) % len(self.menu_items)
-        self.cursor.y = self.camera.to_y_from_bottom(500 - 40 * self.cursor_pos)
+        self.hud.move(self.cursor, 360, 500 - 40 * self.cursor_pos)
 
     def _resume_game(self):
         self.world.reload(self.old_scene)
 
+    def _undo(self):
+        self.old_scene.undo()
+        self._resume_game()
+
+    def _redo(self):
+        self.old_scene.redo()
+        self._resume_game()
+
+    def _save_game(self):
+        self.old_scene.save()
+        self._resume_game()
+
     def _launch_help(self):
         pass
 
     def _quit_game(self):
+        self.old_scene.close()
         self.world.transition(MainMenuScene)
 
 class AboutScene(Scene):
@@ -0,0 +1,125 @@
+"""
+    Plays matches between computer players without any window, to see
+    how changes to unit stats play out
+
+        python -m python_tactics.simulate --matches 10000 --stat Ranged.range=3
+
+    One tab separated row is written per match as it finishes, followed
+    by win rates and turn counts for all of them. Never imports pyglet,
+    so it can run anywhere, on every core.
+"""
+import argparse
+import os
+import random
+import sys
+from contextlib import nullcontext
+from multiprocessing import Pool
+from statistics import mean, median
+
+from python_tactics.ai import greedy_action
+from python_tactics.game_state import STATS, GameState
+
+COLUMNS = ("seed", "winner", "turns", "units_left", "health_left")
+
+# Matches nobody has won after this many turns are draws
+MAX_TURNS = 1000
+
+# Smallest value of each stat the rules can play with: attacks roll below
+# strength and defense, and units need health, speed and range to fight
+SMALLEST_STATS = {"health": 1, "speed": 1, "range": 1, "strength": 1, "defense": 1, "magic": 0}
+
+def override_stats(overrides, stats=STATS):
+    """ Returns stats with overrides applied.
+
+        overrides: strings like "Beefy.health=25", naming a kind of unit
+                   and one of its stats
+    """
+    stats = list(stats)
+    names = [unit_stats.name for unit_stats in stats]
+    for override in overrides:
+        try:
+            target, value = override.split("=")
+            name, stat = target.split(".")
+            kind = names.index(name)
+            stats[kind] = stats[kind]._replace(**{stat: int(value)})
+        except ValueError as error:
+            raise ValueError(f"Can't override {override!r}, expected Kind.stat=number") from error
+        if int(value) < SMALLEST_STATS[stat]:
+            raise ValueError(f"Can't override {override!r}, {stat} must be at least {SMALLEST_STATS[stat]}")
+    return tuple(stats)
+
+def play_match(seed, size=10, team_size=2, stats=STATS, max_turns=MAX_TURNS):
+    """ Play one match with both teams choosing greedy actions, using seed
+        for every random choice. Returns a row of COLUMNS, with -1 as the
+        winner of a draw
+    """
+    rng = random.Random(seed)
+    state = GameState.new_match(size, size, team_size=team_size, stats=stats, rng=rng)
+    while state.winner is None and state.turn < max_turns:
+        state.apply(greedy_action(state, rng))
+    winner = state.winner
+    return (seed, -1 if winner is None else winner, state.turn,
+            len(state.units), sum(unit.health for unit in state.units))
+
+def _play(arguments):
+    return play_match(*arguments)
+
+def simulate(matches, seed=0, processes=None, **match_options):
+    """ Play matches over a pool of processes, yielding each match's row as
+        it finishes. Seeds run from seed to seed + matches - 1
+    """
+    processes = processes or os.cpu_count()
+    options = (match_options.get("size", 10), match_options.get("team_size", 2),
+               match_options.get("stats", STATS), match_options.get("max_turns", MAX_TURNS))
+    jobs = ((match_seed,) + options for match_seed in range(seed, seed + matches))
+    # Big enough chunks that sending jobs costs little next to playing them
+    chunksize = max(1, matches // (processes * 16))
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(_play, jobs, chunksize)
+
+def summarise(rows, team_count=2):
+    " Lines of win rates and turn counts for rows "
+    total = len(rows)
+    if not total:
+        return ["No matches played"]
+    winners = [row[1] for row in rows]
+    turns = [row[2] for row in rows]
+    lines = [f"matches     {total}"]
+    for team in range(team_count):
+        lines.append(f"team {team + 1} won  {winners.count(team) / total:7.2%}")
+    lines.append(f"draws       {winners.count(-1) / total:7.2%}")
+    lines.append(f"turns       mean {mean(turns):.1f}, median {median(turns)}, "
+                 f"min {min(turns)}, max {max(turns)}")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--processes", type=int, default=None, help="defaults to one per core")
+    parser.add_argument("--size", type=int, default=10, help="width and height of the map")
+    parser.add_argument("--team-size", type=int, default=2)
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS)
+    parser.add_argument("--stat", action="append", default=[], metavar="KIND.STAT=N",
+                        help="override a stat, like Ranged.range=3. Can be repeated")
+    parser.add_argument("--output", default="-", help="file for per match rows, - for stdout")
+    options = parser.parse_args(argv)
+    try:
+        stats = override_stats(options.stat)
+    except ValueError as error:
+        parser.error(str(error))
+
+    rows = []
+    with (nullcontext(sys.stdout) if options.output == "-"
+          else open(options.output, "w", encoding="utf-8")) as output:
+        output.write("\t".join(COLUMNS) + "\n")
+        for row in simulate(options.matches, options.seed, options.processes,
+                            size=options.size, team_size=options.team_size,
+                            stats=stats, max_turns=options.max_turns):
+            output.write("\t".join(map(str, row)) + "\n")
+            rows.append(row)
+    # Kept off stdout, so the rows can be piped somewhere on their own
+    print("\n".join(summarise(rows)), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
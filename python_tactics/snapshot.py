@@ -0,0 +1,147 @@
+"""
+    Saves a match part way through and loads it again
+
+    A snapshot is a fixed layout of little endian binary: a header, the
+    state of the match's dice, the map's tiles as one array per field, then
+    the units as one array per field. Everything but the header is read
+    with one bulk array read per field, so even a big map with thousands
+    of units loads in milliseconds.
+"""
+import random
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+from python_tactics.game_state import STATS, Direction, GameState
+
+MAGIC = b"PTSN"
+VERSION = 1
+
+# magic, version, width, height, team count, current team, turn, unit count,
+# computer teams as bits, rng version, whether there is a gaussian to come, and it
+_HEADER = struct.Struct("<4sHHHBBIIBBBd")
+# Words of the Mersenne Twister's state, and where it is in them
+_RNG_WORDS = 625
+
+# Typecodes of the map's fields, then the units', in the order they're stored
+_TILE_FIELDS = (("kinds", "B"), ("heights", "h"), ("costs", "B"))
+_UNIT_FIELDS = (("kind", "B"), ("team", "B"), ("i", "H"), ("j", "H"), ("facing", "B"), ("health", "H"))
+
+_FACINGS = {direction.value: direction for direction in Direction}
+
+class SnapshotError(ValueError):
+    " Data which isn't a snapshot this version can load "
+
+class Snapshot(namedtuple("Snapshot", "game_map state computer_teams")):
+    " A loaded match. game_map is None unless there was a way to make one "
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def _tiles(state, game_map):
+    " The map's fields, made up from the state's costs when there's no map "
+    if game_map is not None:
+        return [getattr(game_map, name) for name, _ in _TILE_FIELDS]
+    size = state.width * state.height
+    return [array("B", bytes(size)), array("h", bytes(2 * size)), array("B", state.costs)]
+
+def save(state, game_map=None, computer_teams=()):
+    """ Returns the snapshot of state as bytes.
+
+        game_map: Map the match is played on, whose tiles are saved.
+                  Without it, only the movement costs are
+        computer_teams: teams a computer player plays
+    """
+    rng_version, words, gaussian = state.rng.getstate()
+    header = _HEADER.pack(MAGIC, VERSION, state.width, state.height, state.team_count,
+                          state.current_team, state.turn, len(state.units),
+                          sum(1 << team for team in computer_teams), rng_version,
+                          gaussian is not None, gaussian or 0.0)
+    chunks = [header, _little_endian(array("I", words)).tobytes()]
+    for (_, typecode), values in zip(_TILE_FIELDS, _tiles(state, game_map)):
+        chunks.append(_little_endian(array(typecode, values)).tobytes())
+    units = state.units
+    columns = ([unit.kind for unit in units], [unit.team for unit in units],
+               [unit.i for unit in units], [unit.j for unit in units],
+               [unit.facing.value for unit in units], [unit.health for unit in units])
+    for (_, typecode), values in zip(_UNIT_FIELDS, columns):
+        chunks.append(_little_endian(array(typecode, values)).tobytes())
+    return b"".join(chunks)
+
+def _reader(data, offset):
+    " A function reading count values of a typecode from data, carrying on from offset "
+    view = memoryview(data)
+
+    def read(typecode, count):
+        nonlocal offset
+        values = array(typecode)
+        end = offset + values.itemsize * count
+        if end > len(data):
+            raise SnapshotError("Snapshot is truncated")
+        values.frombytes(view[offset:end])
+        offset = end
+        return _little_endian(values)
+    return read
+
+def load(data, new_map=None, stats=STATS):
+    """ Returns the Snapshot saved in data. Raises SnapshotError if data
+        isn't a snapshot, or holds a match which can't be played
+
+        new_map: callable taking the width and height of the map and
+                 returning an empty Map, whose tiles are then loaded
+    """
+    try:
+        return _load(data, new_map, stats)
+    except SnapshotError:
+        raise
+    except (struct.error, ValueError, TypeError, IndexError, KeyError) as error:
+        raise SnapshotError(f"Snapshot is corrupt: {error}") from error
+
+def _load(data, new_map, stats):
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is too short to have a header")
+    (magic, version, width, height, team_count, current_team, turn, unit_count,
+     computer_bits, rng_version, has_gaussian, gaussian) = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"Can't load version {version} snapshots, only {VERSION}")
+    if not width or not height or not 0 <= current_team < team_count:
+        raise SnapshotError("Snapshot has no map or no such team to play")
+    read = _reader(data, _HEADER.size)
+
+    rng = random.Random()
+    rng.setstate((rng_version, tuple(read("I", _RNG_WORDS)), gaussian if has_gaussian else None))
+    tiles = [read(typecode, width * height) for _, typecode in _TILE_FIELDS]
+    game_map = new_map(width, height) if new_map is not None else None
+    if game_map is not None:
+        for (name, _), values in zip(_TILE_FIELDS, tiles):
+            getattr(game_map, name)[:] = values
+        costs = game_map.costs
+    else:
+        costs = tiles[-1]
+
+    state = GameState(width, height, costs, team_count, stats, rng)
+    state._start_turn(current_team, turn) #pylint: disable=protected-access
+    kinds, teams, columns, rows, facings, healths = (read(typecode, unit_count)
+                                                     for _, typecode in _UNIT_FIELDS)
+    for kind, team, i, j, facing, health in zip(kinds, teams, columns, rows, facings, healths):
+        if (kind >= len(stats) or team >= team_count or i >= width or j >= height
+                or facing not in _FACINGS or not health):
+            raise SnapshotError(f"Snapshot has an impossible unit at {i}, {j}")
+        if state.unit_at((i, j)) is not None:
+            raise SnapshotError(f"Snapshot has two units at {i}, {j}")
+        state.add_unit(kind, team, i, j, _FACINGS[facing], health)
+    computer_teams = tuple(team for team in range(team_count) if computer_bits >> team & 1)
+    return Snapshot(game_map, state, computer_teams)
+
+def save_file(path, state, game_map=None, computer_teams=()):
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(save(state, game_map, computer_teams))
+
+def load_file(path, new_map=None, stats=STATS):
+    with open(path, "rb") as snapshot_file:
+        return load(snapshot_file.read(), new_map, stats)
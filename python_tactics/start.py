@@ -9,9 +9,11 @@ from pyglet.gl import (GL_BLEND, GL_ONE_MINUS_SRC_ALPHA, GL_SRC_ALPHA,
 from pyglet.window import Window
 
 from python_tactics.camera import PEPPY, Camera
+from python_tactics.new_sprite import animation_clock
 from python_tactics.scenes import MainMenuScene, World
 
-def start():
+def start(scene=MainMenuScene, **scene_options):
+    " Open the window on scene, created with scene_options, and run the game "
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
@@ -20,10 +22,12 @@ def start():
     # Create the default camera and have it always updating
     camera = Camera((-600, -300, 1400, 600), (400, 400), 300, speed=PEPPY)
     clock.schedule(camera.tick)
+    # Every animation plays against the one clock
+    clock.schedule(animation_clock.tick)
 
     # Load the first scene
     world = World(window, camera)
-    world.transition(MainMenuScene)
+    world.transition(scene, **scene_options)
 
     # centre the window on whichever screen it is currently on
     window.set_location(int(window.screen.width/2 - window.width/2),
@@ -0,0 +1,143 @@
+"""
+    Draws the ground of a Map as textured quads, a chunk of tiles at a time
+"""
+from array import array
+from collections import OrderedDict
+
+from pyglet.gl import GL_QUADS
+from pyglet.graphics import TextureGroup, vertex_list
+
+
+class TerrainRenderer:
+    """ Every tile of the map is one quad of the same image. The map is cut
+        into square chunks of tiles, and each chunk is a single vertex list
+        with its positions, texture coordinates and colours filled in bulk.
+
+        Chunks are only built once they come into view, only the ones in
+        view are drawn, and the least recently seen are thrown away once
+        more than `budget` of them exist. Tints are remembered separately
+        so they survive a chunk being thrown away and built again.
+    """
+
+    def __init__(self, gamemap, image, chunk_size=16, budget=64):
+        """ gamemap: Map whose tiles are drawn
+            image: what each tile looks like, anchored on its centre
+            chunk_size: width and height of a chunk, in tiles
+            budget: most chunks to keep built at once
+        """
+        self.map = gamemap
+        self.chunk_size = chunk_size
+        self.budget = budget
+        self.texture = image.get_texture()
+        self.group = TextureGroup(self.texture)
+        self._left, self._bottom = image.anchor_x, image.anchor_y
+        self._right, self._top = image.width - self._left, image.height - self._bottom
+        self._chunks = OrderedDict()
+        self._tints = {}
+
+    def _chunk_tiles(self, chunk):
+        " The column and row ranges covered by chunk "
+        chunk_column, chunk_row = chunk
+        size = self.chunk_size
+        columns = range(chunk_column * size, min(self.map.width, (chunk_column + 1) * size))
+        rows = range(chunk_row * size, min(self.map.height, (chunk_row + 1) * size))
+        return columns, rows
+
+    def _build(self, chunk):
+        columns, rows = self._chunk_tiles(chunk)
+        count = len(columns) * len(rows)
+        left, bottom, right, top = self._left, self._bottom, self._right, self._top
+        # Each column of the chunk is a slice of the map's coordinates
+        height, map_xs, map_ys = self.map.height, self.map.xs, self.map.ys
+        xs, ys = array("f"), array("f")
+        for i in columns:
+            start = i * height
+            xs.extend(map_xs[start + rows.start:start + rows.stop])
+            ys.extend(map_ys[start + rows.start:start + rows.stop])
+        lefts, rights = array("f", [x - left for x in xs]), array("f", [x + right for x in xs])
+        bottoms, tops = array("f", [y - bottom for y in ys]), array("f", [y + top for y in ys])
+        # Corners go anticlockwise from the bottom left
+        vertices = array("f", bytes(32 * count))
+        vertices[0::8], vertices[1::8], vertices[2::8], vertices[3::8] = lefts, bottoms, rights, bottoms
+        vertices[4::8], vertices[5::8], vertices[6::8], vertices[7::8] = rights, tops, lefts, tops
+        vertices_list = vertex_list(4 * count,
+            ("v2f/static", vertices),
+            ("t3f/static", array("f", self.texture.tex_coords) * count),
+            ("c4B/dynamic", array("B", b"\xff" * 16) * count))
+        for cell, color in self._tints.get(chunk, {}).items():
+            self._write_tint(vertices_list, chunk, cell, color)
+        return vertices_list
+
+    def _write_tint(self, vertices_list, chunk, cell, color):
+        columns, rows = self._chunk_tiles(chunk)
+        column, row = cell
+        start = 16 * ((column - columns.start) * len(rows) + row - rows.start)
+        red, green, blue = color
+        vertices_list.colors[start:start + 16] = (red, green, blue, 255) * 4
+
+    def tint(self, cell, color):
+        " Colour the four corners of the tile at cell "
+        column, row = cell
+        chunk = column // self.chunk_size, row // self.chunk_size
+        tints = self._tints.setdefault(chunk, {})
+        if color == (255, 255, 255):
+            tints.pop(cell, None)
+        else:
+            tints[cell] = color
+        built = self._chunks.get(chunk)
+        if built is not None:
+            self._write_tint(built, chunk, cell, color)
+
+    def visible_chunks(self, bounds):
+        """ Returns the chunks which have a tile showing inside bounds,
+            a (left, bottom, right, top) rectangle in world coordinates,
+            from the back of the map to the front
+        """
+        left, bottom, right, top = bounds
+        # Pad the view by how far a tile's image reaches past its centre
+        tiles = self.map.tile_range(left - self._right, bottom - self._top,
+                                    right + self._left, top + self._bottom)
+        if tiles is None:
+            return []
+        first_column, last_column, first_row, last_row = tiles
+        size = self.chunk_size
+        chunks = [(chunk_column, chunk_row)
+                  for chunk_column in range(first_column // size, last_column // size + 1)
+                  for chunk_row in range(first_row // size, last_row // size + 1)]
+        # A rectangle covers a diamond of tiles, so skip the chunks that
+        # are only in the corners of the range
+        return [chunk for chunk in chunks if self._chunk_overlaps(chunk, bounds)]
+
+    def _chunk_overlaps(self, chunk, bounds):
+        left, bottom, right, top = bounds
+        columns, rows = self._chunk_tiles(chunk)
+        get_coordinates = self.map.get_coordinates
+        chunk_left, _ = get_coordinates(columns.start, rows[-1])
+        chunk_right, _ = get_coordinates(columns[-1], rows.start)
+        _, chunk_top = get_coordinates(columns.start, rows.start)
+        _, chunk_bottom = get_coordinates(columns[-1], rows[-1])
+        return chunk_left - self._left <= right and chunk_right + self._right >= left \
+            and chunk_bottom - self._bottom <= top and chunk_top + self._top >= bottom
+
+    def draw(self, bounds):
+        " Draw the chunks inside bounds, building any which aren't yet "
+        visible = self.visible_chunks(bounds)
+        chunks = self._chunks
+        for chunk in visible:
+            if chunk in chunks:
+                chunks.move_to_end(chunk)
+            else:
+                chunks[chunk] = self._build(chunk)
+        while len(chunks) > max(self.budget, len(visible)):
+            _, evicted = chunks.popitem(last=False)
+            evicted.delete()
+
+        self.group.set_state()
+        for chunk in visible:
+            chunks[chunk].draw(GL_QUADS)
+        self.group.unset_state()
+
+    def delete(self):
+        for built in self._chunks.values():
+            built.delete()
+        self._chunks.clear()
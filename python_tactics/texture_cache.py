@@ -0,0 +1,152 @@
+"""
+    On disk cache of decoded images, so PNGs are only decoded once
+
+    Each cached image is a small header followed by its raw RGBA pixels,
+    bottom row first. Cached images are memory mapped and handed to
+    pyglet as they are, without reading or copying them.
+"""
+import ctypes
+import mmap
+import os
+import struct
+import threading
+from hashlib import sha1
+
+import pyglet
+
+# magic, format version, width, height, source mtime in ns, source size
+HEADER = struct.Struct("<4sHIIQQ")
+MAGIC = b"PTTC"
+VERSION = 1
+
+def default_directory():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "python-tactics", "textures")
+
+class TextureCache:
+    """ Decoded RGBA pixels of image files, stored in `directory`.
+
+        An entry is used as long as the source file's modification time
+        and size match the ones it was made from, and is rebuilt
+        otherwise. Once the cache is bigger than `max_bytes`, the entries
+        used least recently are deleted.
+
+        Images can be decoded ahead of time on another thread with
+        `prefetch`, and are then handed to the next `load` of them. A
+        `load` of an image still being prefetched waits for it, rather
+        than decoding it again.
+    """
+
+    def __init__(self, directory, max_bytes=128 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Prefetched images by absolute path, None while being decoded
+        self._prefetched = {}
+        self._lock = threading.Lock()
+        self._decoded = threading.Condition(self._lock)
+
+    def _entry_path(self, path):
+        name = sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".rgba")
+
+    def load(self, path):
+        " Returns ImageData for the image file at path "
+        key = os.path.abspath(path)
+        with self._decoded:
+            while key in self._prefetched and self._prefetched[key] is None:
+                self._decoded.wait()
+            prefetched = self._prefetched.pop(key, None)
+        if prefetched is not None:
+            return prefetched
+        return self._decode(path)
+
+    def _decode(self, path):
+        " Read the image file at path through the cache, leaving prefetches alone "
+        source = os.stat(path)
+        entry = self._entry_path(path)
+        cached = self._read(entry, source)
+        if cached is not None:
+            return cached
+        image = pyglet.image.load(path).get_image_data()
+        self._write(entry, source, image)
+        return image
+
+    def prefetch(self, path):
+        " Decode the image file at path for the next `load` of it "
+        key = os.path.abspath(path)
+        with self._lock:
+            if key in self._prefetched:
+                return
+            # Claimed, so other threads don't decode it at the same time
+            self._prefetched[key] = None
+        image = None
+        try:
+            image = self._decode(path)
+        finally:
+            with self._decoded:
+                if image is None:
+                    # Failed, so the next load decodes it and raises the error itself
+                    del self._prefetched[key]
+                else:
+                    self._prefetched[key] = image
+                self._decoded.notify_all()
+
+    def _read(self, entry, source):
+        try:
+            with open(entry, "rb") as cached:
+                header = cached.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return None
+                magic, version, width, height, mtime, size = HEADER.unpack(header)
+                if (magic, version, mtime, size) != (MAGIC, VERSION, source.st_mtime_ns, source.st_size):
+                    return None
+                length = width * height * 4
+                if os.fstat(cached.fileno()).st_size != HEADER.size + length:
+                    return None
+                # Copy on write, so ctypes can share the mapping without copying it
+                mapped = mmap.mmap(cached.fileno(), 0, access=mmap.ACCESS_COPY)
+            os.utime(entry)
+        except OSError:
+            return None
+        pixels = (ctypes.c_ubyte * length).from_buffer(mapped, HEADER.size)
+        return pyglet.image.ImageData(width, height, "RGBA", pixels, pitch=width * 4)
+
+    def _write(self, entry, source, image):
+        pixels = image.get_data("RGBA", image.width * 4)
+        header = HEADER.pack(MAGIC, VERSION, image.width, image.height,
+                             source.st_mtime_ns, source.st_size)
+        # Per thread, as a prefetch and a load can write the same entry
+        partial = "%s.%d.partial" % (entry, threading.get_ident())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(partial, "wb") as cached:
+                cached.write(header)
+                cached.write(pixels)
+            os.replace(partial, entry)
+            self._trim()
+        except OSError:
+            # Not being able to cache only makes the next start slower
+            pass
+
+    def _trim(self):
+        " Delete the least recently used entries until under max_bytes "
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".rgba"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".rgba"):
+                    os.remove(os.path.join(self.directory, name))
+
+# The cache every image in the game is loaded through
+textures = TextureCache(default_directory())
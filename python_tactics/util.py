@@ -2,11 +2,13 @@
     Helper functions for loading files into pyglet for this project
 """
 import os
-from math import atan2, pi
+from weakref import WeakKeyDictionary
 
 import pkg_resources
-import pyglet
-from pyglet.image import Animation, AnimationFrame
+from pyglet.image import Animation, AnimationFrame, ImageGrid
+
+from python_tactics.atlas import Atlas
+from python_tactics.texture_cache import textures
 
 
 def asset_to_file(asset_name):
@@ -15,21 +17,79 @@ def asset_to_file(asset_name):
         os.path.join("assets", asset_name)
     )
 
+# Packed images, used in place of the separate files once it has been built
+atlas = Atlas(asset_to_file("atlas"))
+
+def load_image(name):
+    """ Loads the image at images/name.png in the assets folder, from the
+        packed atlas if it is there
+    """
+    region = atlas.region(name)
+    if region is None:
+        return textures.load(asset_to_file("images/%s.png" % name))
+    return region
+
+def image_file(name):
+    " Path of the file load_image(name) reads from "
+    return atlas.page_file(name) or asset_to_file("images/%s.png" % name)
+
+def prefetch_images(*names):
+    " Decode the files load_image will read names from, ahead of time "
+    for path in {image_file(name) for name in names}:
+        textures.prefetch(path)
+
 def load_sprite_asset(name):
     " Loads png files from the assets folder, with anchor in middle "
-    image = pyglet.image.load(asset_to_file("images/%s.png" % name))
+    image = load_image(name)
     image.anchor_x = int(image.width / 2)
     return image
 
+def load_grid_frames(name, indexes, rows, columns):
+    " Loads the frames at indexes of a rows x columns grid image "
+    frames = [atlas.region("%s/%d" % (name, index)) for index in indexes]
+    if None in frames:
+        grid = ImageGrid(load_image(name), rows, columns)
+        frames = [grid[index] for index in indexes]
+    return frames
+
+def prefetch_grid_frames(name, indexes):
+    " Decode the files load_grid_frames will read, ahead of time "
+    frames = ["%s/%d" % (name, index) for index in indexes]
+    if all(frame in atlas for frame in frames):
+        prefetch_images(*frames)
+    else:
+        prefetch_images(name)
+
 def load_sprite_animation(name, action, frames=8, duration=0.1):
     " Creates an animation from files in the assets folder "
-    images = [pyglet.image.load(asset_to_file("images/%s/%s%d.png") % (name, action, i))
+    images = [load_image("%s/%s%d" % (name, action, i))
                 for i in range(1, frames + 1)]
     for image in images:
         image.anchor_x = image.width / 2
     frames = [AnimationFrame(i, duration) for i in images]
     return Animation(frames)
 
+# Transformed copies of images, by source image then transform and anchor
+_TRANSFORMED = WeakKeyDictionary()
+
+def transformed(image, flip_x=False, flip_y=False):
+    """ A copy of image flipped about its anchor, made the first time it is
+        asked for and shared after that, so it mustn't be changed. Copies
+        flipped left to right are marked `requires_reverse`, as their image
+        data is still the original's
+    """
+    key = flip_x, flip_y, image.anchor_x, image.anchor_y
+    copies = _TRANSFORMED.setdefault(image, {})
+    copy = copies.get(key)
+    if copy is None:
+        copy = copies[key] = image.get_texture().get_transform(flip_x=flip_x, flip_y=flip_y)
+        # The texture's anchors can be older than the image's
+        copy.anchor_x = image.width - image.anchor_x if flip_x else image.anchor_x
+        copy.anchor_y = image.height - image.anchor_y if flip_y else image.anchor_y
+        if flip_x:
+            copy.requires_reverse = True
+    return copy
+
 def faces_from_images(north=None, east=None, south=None, west=None):
     """ Creates the proper standing sprites for a Character given at
         least two of the stances
@@ -39,49 +99,11 @@ def faces_from_images(north=None, east=None, south=None, west=None):
     if not east and not north:
         raise Exception("Invalid sprite. Needs either west or north")
     if not north:
-        north = east.get_texture().get_transform(flip_x=True)
-        north.requires_reverse = True
+        north = transformed(east, flip_x=True)
     if not east:
-        east = north.get_texture().get_transform(flip_x=True)
-        east.requires_reverse = True
+        east = transformed(north, flip_x=True)
     if not west:
-        west = south.get_texture().get_transform(flip_x=True)
-        west.requires_reverse = True
+        west = transformed(south, flip_x=True)
     if not south:
-        south = west.get_texture().get_transform(flip_x=True)
-        south.requires_reverse = True
+        south = transformed(west, flip_x=True)
     return north, east, south, west
-
-def find_path(map_points, start_x, start_y, end_x, end_y):
-    """ Given a list of lists with (x, y) values, and a start
-        and end pairs, find the isometric path between start
-        and end. That is, if x, y is in row r, you can only
-        move to spots within row r. To move in another direction,
-        you must move to an adjacent list of x, y values, keeping
-        your same position.
-    """
-    def index_of(x, y):
-        for column_num, column in enumerate(map_points):
-            if (x, y) in column:
-                return column_num, column.index((x, y))
-        return None # this will definitely break something
-    dy, dx = end_y - start_y, end_x - start_x
-    if not dx and not dy:
-        return []
-    angle = atan2(dy, dx)
-    col, row = index_of(start_x, start_y)
-    if 0 <= angle <= pi/2:
-        # "going east"
-        next_col, next_row = col, row - 1
-    elif pi/2 < angle <= pi:
-        # "going north"
-        next_col, next_row = col - 1, row
-    elif -pi/2 <= angle <= 0:
-        # "going south"
-        next_col, next_row = col + 1, row
-    else:
-        # "going west"
-        next_col, next_row = col, row + 1
-    next_x, next_y = map_points[next_col][next_row]
-    return [(next_x, next_y)] +\
-            find_path(map_points, next_x, next_y, end_x, end_y)
@@ -0,0 +1,103 @@
+"""
+    Zobrist hashing of game states, and a table to remember work by hash
+
+    A state's hash is the exclusive or of a 64 bit key for every unit,
+    made from everything about it, and a key for the team to move. A
+    change to one unit is applied by xoring its old key out and its new
+    key in, so the hash costs nothing to keep up to date. Keys are mixed
+    from the unit's values as they are needed rather than looked up, so
+    there is no table of keys to build for a big map.
+"""
+
+MASK = (1 << 64) - 1
+
+# Keep the kinds of key apart, so a cell key never equals a unit key
+_UNIT, _CELL, _SIDE = 1 << 62, 2 << 62, 3 << 62
+
+def mix(value):
+    " Scramble value into 64 well spread bits, with splitmix64's finaliser "
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+def unit_key(index, kind, team, facing, health):
+    """ Key of a unit standing on cell index, with facing a Direction value.
+        index must be under 2 ** 32 and health under 2 ** 16
+    """
+    return mix(_UNIT | ((((index << 8 | kind) << 4 | team) << 2 | facing) << 16 | health))
+
+def cell_key(index):
+    " Key of something standing on cell index, whatever it is "
+    return mix(_CELL | index)
+
+def side_key(team):
+    " Key of team being the one to move "
+    return mix(_SIDE | team)
+
+class TranspositionTable:
+    """ A fixed number of slots remembering a value for a hash.
+
+        Each hash has one slot, picked by its low bits. When two hashes
+        want the same slot, the newcomer replaces what's there if it
+        was stored in an earlier generation, or it has at least as high
+        a priority, like the search depth or cost behind it. Otherwise
+        the newcomer isn't stored. The full hash is kept to tell apart
+        hashes sharing a slot.
+    """
+
+    __slots__ = ("_mask", "_keys", "_values", "_priorities", "_generations",
+                 "generation", "hits", "misses", "stores", "rejected")
+
+    def __init__(self, size=1 << 16):
+        " size: number of slots, rounded up to a power of two "
+        size = 1 << max(0, size - 1).bit_length()
+        self._mask = size - 1
+        self._keys = [None] * size
+        self._values = [None] * size
+        self._priorities = [0] * size
+        self._generations = [0] * size
+        self.generation = 0
+        self.hits = self.misses = self.stores = self.rejected = 0
+
+    def __len__(self):
+        return len(self._keys) - self._keys.count(None)
+
+    def get(self, key, default=None):
+        slot = key & self._mask
+        if self._keys[slot] == key:
+            self.hits += 1
+            return self._values[slot]
+        self.misses += 1
+        return default
+
+    def put(self, key, value, priority=0):
+        slot = key & self._mask
+        stored = self._keys[slot]
+        if (stored is not None and stored != key
+                and self._generations[slot] == self.generation
+                and self._priorities[slot] > priority):
+            self.rejected += 1
+            return
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._priorities[slot] = priority
+        self._generations[slot] = self.generation
+        self.stores += 1
+
+    def new_generation(self):
+        " Let everything stored so far be replaced by anything new "
+        self.generation += 1
+
+    def clear(self):
+        size = len(self._keys)
+        self._keys = [None] * size
+        self._values = [None] * size
+        self._priorities = [0] * size
+        self._generations = [0] * size
+        self.hits = self.misses = self.stores = self.rejected = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0